@@ -0,0 +1,48 @@
+"""add currency to asset snapshots
+
+Revision ID: 6ce4a9454d12
+Revises: 7d1268c3e089
+Create Date: 2026-10-17 00:14:17.269844
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6ce4a9454d12'
+down_revision: Union[str, Sequence[str], None] = '7d1268c3e089'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows were all valued in TWD. Batch mode so SQLite can swap the constraints.
+    with op.batch_alter_table('asset_snapshot_rollups') as batch_op:
+        batch_op.add_column(sa.Column('currency', sa.String(length=3), server_default='TWD', nullable=False))
+        batch_op.drop_constraint('_user_resolution_period_uc', type_='unique')
+        batch_op.create_unique_constraint(
+            '_user_resolution_period_currency_uc', ['user_id', 'resolution', 'period_start', 'currency']
+        )
+    with op.batch_alter_table('asset_snapshots') as batch_op:
+        batch_op.add_column(sa.Column('currency', sa.String(length=3), server_default='TWD', nullable=False))
+        batch_op.drop_constraint('_user_date_uc', type_='unique')
+        batch_op.create_unique_constraint('_user_date_currency_uc', ['user_id', 'snapshot_date', 'currency'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Only the TWD rows fit the old (currency-less) unique constraints
+    op.execute("DELETE FROM asset_snapshots WHERE currency <> 'TWD'")
+    op.execute("DELETE FROM asset_snapshot_rollups WHERE currency <> 'TWD'")
+    with op.batch_alter_table('asset_snapshots') as batch_op:
+        batch_op.drop_constraint('_user_date_currency_uc', type_='unique')
+        batch_op.create_unique_constraint('_user_date_uc', ['user_id', 'snapshot_date'])
+        batch_op.drop_column('currency')
+    with op.batch_alter_table('asset_snapshot_rollups') as batch_op:
+        batch_op.drop_constraint('_user_resolution_period_currency_uc', type_='unique')
+        batch_op.create_unique_constraint('_user_resolution_period_uc', ['user_id', 'resolution', 'period_start'])
+        batch_op.drop_column('currency')
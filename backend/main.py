@@ -2,12 +2,30 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+from contextlib import asynccontextmanager  # noqa: E402
+
 from fastapi import FastAPI  # noqa: E402
 from fastapi.middleware.cors import CORSMiddleware  # noqa: E402
-from src.api import assets, friend_codes, market, snapshots, transactions, user  # noqa: E402
+from src.api import assets, friend_codes, market, portfolio, snapshots, transactions, user  # noqa: E402
 from src.config import firebase  # noqa: E402
+from src.services import market as market_service  # noqa: E402
+from src.services.prefetch_service import prefetcher  # noqa: E402
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve recently stored quotes instead of cold-starting Yahoo after a restart
+    loaded = market_service.warm_caches_from_store()
+    print(f"Warmed market caches with {loaded} stored entries.")
+    # Keep quotes for held symbols hot in the background
+    prefetcher.start()
+    yield
+    prefetcher.stop()
+    # Write quotes still buffered for price_quotes before the worker exits
+    market_service.flush_quotes()
+
 
-app = FastAPI(title="Finance Dashboard Backend")
+app = FastAPI(title="Finance Dashboard Backend", lifespan=lifespan)
 
 origins = ["http://localhost:4200"]
 app.add_middleware(
@@ -23,6 +41,8 @@ firebase.init_app()
 app.include_router(assets.router, prefix="/api")
 app.include_router(transactions.router, prefix="/api")
 app.include_router(snapshots.router, prefix="/api")
+app.include_router(snapshots.admin_router, prefix="/api")
+app.include_router(portfolio.router, prefix="/api")
 app.include_router(market.router, prefix="/api")
 app.include_router(user.router, prefix="/api")
 app.include_router(friend_codes.router, prefix="/api")
@@ -0,0 +1,16 @@
+if [ -z "$1" ]; then
+    echo "❌ 錯誤：請輸入起始日期"
+    echo "用法：./scripts/backfill_snapshots.sh START_DATE [--end END_DATE] [--user UID ...]"
+    echo "範例：./scripts/backfill_snapshots.sh 2025-01-01 --end 2025-12-31 --user abc123"
+    exit 1
+fi
+
+cd "$(dirname "$0")/.."
+
+START_DATE="$1"
+shift
+
+echo "🔄 正在回補缺少的每日資產快照 (從 $START_DATE 開始)..."
+python3 -m src.services.backfill_service --start "$START_DATE" "$@"
+
+echo "✅ 快照回補完成！"
@@ -1,9 +1,10 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, status, BackgroundTasks
+from fastapi import APIRouter, Depends, status
 from sqlalchemy.orm import Session
 from src import database, schemas, models
 from src.services import asset_service, transaction_service
+from src.services.logo_service import logo_queue
 from src.dependencies.auth import get_current_user
 
 router = APIRouter(prefix="/assets", tags=["Assets"])
@@ -22,29 +23,25 @@ def read_assets(
 )
 def create_asset(
     asset_in: schemas.AssetCreate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
     asset = asset_service.AssetService.create_asset(db, asset_in, current_user.uid)
     if asset.symbol:
-        background_tasks.add_task(
-            asset_service.AssetService.fetch_and_update_logo, asset.id
-        )
+        logo_queue.enqueue(asset.id, asset.symbol, (asset.meta_data or {}).get("region"))
     return asset
 
 @router.patch("/{asset_id}", response_model=schemas.AssetResponse)
 def update_asset(
     asset_id: int,
     asset_update: schemas.AssetUpdate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
     asset = asset_service.AssetService.update_asset(db, asset_id, asset_update, current_user.uid)
     
     if asset_update.symbol or (asset.symbol and not asset.meta_data.get("logo_url")):
-        background_tasks.add_task(asset_service.AssetService.fetch_and_update_logo, asset.id)
+        logo_queue.enqueue(asset.id, asset.symbol, asset.meta_data.get("region"))
         
     return asset
 
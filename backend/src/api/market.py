@@ -1,17 +1,21 @@
-from datetime import datetime
-from fastapi import APIRouter, HTTPException
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
 
 from src import schemas
 from src.services import market  # This imports your existing market.py logic
+from src.services.market_client import MarketTimeoutError, market_client
+from src.services.prefetch_service import prefetcher
+from src.services.valuation_service import holdings_cache
 
 router = APIRouter(prefix="/market", tags=["Market"])
 
 
 @router.get("/stock/{ticker}", response_model=schemas.StockPriceResponse)
-def get_stock_price(ticker: str, region: str = "US"):
+async def get_stock_price(ticker: str, region: str = "US"):
     try:
-        # Call the existing service logic
-        data = market.get_stock_data(ticker, region.upper())
+        data = await market_client.get_stock_data(ticker, region.upper())
         return {
             "ticker": data["symbol"],
             "price": data["price"],
@@ -19,15 +23,52 @@ def get_stock_price(ticker: str, region: str = "US"):
         }
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except MarketTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Get stock price error: {str(e)}")
 
 
+@router.get("/stocks", response_model=schemas.StockPriceBatchResponse)
+async def get_stock_prices(
+    tickers: str = Query(..., description="Comma-separated tickers, e.g. TSLA,2330"),
+    regions: str = Query(
+        "", description="Comma-separated regions aligned with tickers, e.g. US,TW. Defaults to US"
+    ),
+):
+    ticker_list = [t.strip() for t in tickers.split(",") if t.strip()]
+    region_list = [r.strip().upper() for r in regions.split(",")]
+
+    if not ticker_list:
+        raise HTTPException(status_code=400, detail="No tickers provided")
+
+    region_map = {
+        ticker: (region_list[i] if i < len(region_list) and region_list[i] else "US")
+        for i, ticker in enumerate(ticker_list)
+    }
+
+    try:
+        data = await market_client.get_stock_data_many(ticker_list, region_map)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Get stock prices error: {str(e)}")
+
+    return {
+        "quotes": {
+            ticker: {
+                "ticker": quote["symbol"],
+                "price": quote["price"],
+                "currency": quote["currency"],
+            }
+            for ticker, quote in data.items()
+        },
+        "not_found": [t for t in ticker_list if t not in data],
+    }
+
+
 @router.get("/rate", response_model=schemas.ExchangeRateResponse)
-def get_exchange_rate(from_curr: str, to_curr: str):
+async def get_exchange_rate(from_curr: str, to_curr: str):
     try:
-        # Call the existing service logic
-        rate = market.get_exchange_rate(from_curr, to_curr)
+        rate = await market_client.get_exchange_rate(from_curr, to_curr)
 
         return {
             "from_currency": from_curr.upper(),  # Matches the schema field name
@@ -37,7 +78,97 @@ def get_exchange_rate(from_curr: str, to_curr: str):
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except MarketTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Get exchange rate error: {str(e)}"
         )
+
+
+@router.get("/rates", response_model=schemas.ExchangeRateBatchResponse)
+async def get_exchange_rates(base: str = Query(..., description="Target currency, e.g. TWD")):
+    try:
+        rates, updated_at = await market_client.get_exchange_rates(base)
+
+        return {"base": base.upper(), "rates": rates, "updated_at": updated_at}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except MarketTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Get exchange rates error: {str(e)}"
+        )
+
+
+@router.get("/history", response_model=schemas.PriceHistoryResponse)
+def get_price_history(
+    tickers: str = Query("", description="Comma-separated tickers, e.g. TSLA,2330"),
+    regions: str = Query(
+        "", description="Comma-separated regions aligned with tickers, e.g. US,TW. Defaults to US"
+    ),
+    currencies: str = Query("", description="Comma-separated currencies for USD -> X history, e.g. TWD,JPY"),
+    start_date: Optional[date] = Query(None, description="Start date in YYYY-MM-DD format"),
+    end_date: Optional[date] = Query(None, description="End date in YYYY-MM-DD format"),
+):
+    """
+    Daily closes as compact parallel arrays, served from our own price_history
+    table. Only date ranges not stored yet are downloaded.
+    Defaults to the last 365 days.
+    """
+    ticker_list = [t.strip() for t in tickers.split(",") if t.strip()]
+    region_list = [r.strip().upper() for r in regions.split(",")]
+    currency_list = [c.strip().upper() for c in currencies.split(",") if c.strip()]
+
+    if not ticker_list and not currency_list:
+        raise HTTPException(status_code=400, detail="No tickers or currencies provided")
+
+    unsupported = [c for c in currency_list if c not in market.SUPPORTED_CURRENCIES]
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"不支援的貨幣: {', '.join(unsupported)}")
+
+    if not end_date:
+        end_date = date.today()
+    if not start_date:
+        start_date = end_date - timedelta(days=365)
+
+    region_map = {
+        ticker: (region_list[i] if i < len(region_list) and region_list[i] else "US")
+        for i, ticker in enumerate(ticker_list)
+    }
+
+    try:
+        symbols = market.resolve_symbols(ticker_list, region_map)
+        fx_symbols = {c: market.fx_symbol(c) for c in currency_list if c != "USD"}
+        history = market.get_price_history(
+            list(symbols.values()) + list(fx_symbols.values()), start_date, end_date
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Get price history error: {str(e)}")
+
+    def to_series(symbol: str) -> dict:
+        dates, closes = history.get(symbol, ([], []))
+        return {"symbol": symbol, "dates": dates, "closes": closes}
+
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "stocks": {ticker: to_series(symbol) for ticker, symbol in symbols.items()},
+        "fx": {currency: to_series(symbol) for currency, symbol in fx_symbols.items()},
+    }
+
+
+@router.get("/cache-stats", summary="Hit / miss statistics of the market and holdings caches")
+def get_cache_stats():
+    return {**market.get_cache_stats(), "holdings_cache": holdings_cache.stats()}
+
+
+@router.get("/health", summary="Market data provider and circuit breaker state")
+def get_market_health():
+    return {**market.get_upstream_status(), "client": market_client.stats()}
+
+
+@router.get("/prefetch-status", summary="Last run of the background market prefetcher")
+def get_prefetch_status():
+    return prefetcher.status()
@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from src import database, models, schemas
+from src.dependencies.auth import get_current_user
+from src.services import market
+from src.services.valuation_service import ValuationService
+
+router = APIRouter(prefix="/portfolio", tags=["Portfolio"])
+
+
+@router.get("/valuation", response_model=schemas.PortfolioValuationResponse)
+def read_valuation(
+    currency: str = Query("TWD", description="Base currency of the valuation"),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Current net worth and per-type breakdown, valued at the latest cached
+    prices and exchange rates. Same rules as the daily snapshot.
+    """
+    currency = currency.upper()
+    if currency not in market.SUPPORTED_CURRENCIES:
+        raise HTTPException(status_code=400, detail=f"Unsupported currency: {currency}")
+
+    total, breakdown = ValuationService.get_user_valuation(db, current_user.uid, currency)
+    return {
+        "base_currency": currency,
+        "total_net_worth": total,
+        "breakdown": breakdown,
+        "updated_at": datetime.now(),
+    }
@@ -1,49 +1,97 @@
 import os
 from datetime import date, timedelta
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from src import database, models, schemas
 from src.dependencies.auth import get_current_user
-from src.services.snapshot_service import SnapshotService
+from src.services.backfill_service import SnapshotBackfillService
+from src.services.snapshot_job_service import SnapshotJobService
+from src.services.snapshot_service import SNAPSHOT_CURRENCIES, get_period_start, to_columnar
 
 router = APIRouter(prefix="/snapshots", tags=["Snapshots"])
 
+# Router for admin-specific actions
+admin_router = APIRouter(prefix="/admin/snapshots", tags=["Admin: Snapshots"])
+
 # --- Write Endpoint (for Scheduler) ---
 
 CRON_SECRET = os.getenv("CRON_SECRET", "my-secret-key-123")
 
-@router.post("/capture-all", summary="Trigger daily snapshot for all users")
+@router.post(
+    "/capture-all",
+    response_model=schemas.SnapshotJobResponse,
+    status_code=202,
+    summary="Trigger daily snapshot for all users",
+)
 def trigger_daily_snapshot(
     target_date: Optional[date] = Query(None, description="Force snapshot for specific date (YYYY-MM-DD). Defaults to yesterday."),
+    force: bool = Query(False, description="Start a new run even if this date already completed"),
     x_cron_secret: str = Header(None),
     db: Session = Depends(database.get_db)
 ):
     """
     [Protected] Triggered by Cloud Scheduler to generate daily snapshots for all users.
+    Returns immediately with a job; poll GET /snapshots/jobs/{job_id} for progress.
+    Calling again for the same date returns the running job, or resumes an
+    interrupted one from its checkpoint.
     """
     if x_cron_secret != CRON_SECRET:
         raise HTTPException(status_code=403, detail="Invalid Cron Secret")
 
-    users = db.query(models.User).all()
-    results = []
-    
     snapshot_date = target_date if target_date else (date.today() - timedelta(days=1))
-    
-    print(f"Starting daily snapshot for {len(users)} users...")
 
-    for user in users:
-        try:
-            net_worth = SnapshotService.create_daily_snapshot(db, user.uid, snapshot_date)
-            results.append({"uid": user.uid, "status": "success", "net_worth": net_worth})
-        except Exception as e:
-            print(f"Failed snapshot for user {user.uid}: {e}")
-            results.append({"uid": user.uid, "status": "failed", "error": str(e)})
+    job, started = SnapshotJobService.start(db, snapshot_date, force)
+    if started:
+        print(f"Started snapshot job {job.id} for {snapshot_date}.")
+
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=schemas.SnapshotJobResponse, summary="Get capture-all job progress")
+def get_snapshot_job(
+    job_id: str,
+    x_cron_secret: str = Header(None),
+    db: Session = Depends(database.get_db)
+):
+    """
+    [Protected] Processed, failed and remaining user counts of a capture-all job.
+    """
+    if x_cron_secret != CRON_SECRET:
+        raise HTTPException(status_code=403, detail="Invalid Cron Secret")
+
+    job = SnapshotJobService.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Snapshot job not found")
+    return job
+
+
+@admin_router.post("/backfill", response_model=schemas.SnapshotBackfillResponse)
+def backfill_snapshots(
+    user_id: str = Query(..., description="User uid to backfill"),
+    start_date: date = Query(..., description="First day to backfill (YYYY-MM-DD)"),
+    end_date: Optional[date] = Query(None, description="Last day to backfill (YYYY-MM-DD). Defaults to yesterday."),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    [Admin] Fill days without a snapshot by replaying the user's transactions
+    against historical closes and FX. Existing snapshots are left untouched.
+    """
+    if current_user.role not in [models.UserRole.ADMIN, models.UserRole.OWNER]:
+        raise HTTPException(status_code=403, detail="Permission denied")
 
-    print("Daily snapshot completed.")
-    return {"message": "Batch snapshot completed", "details": results}
+    if not db.query(models.User).filter(models.User.uid == user_id).first():
+        raise HTTPException(status_code=404, detail="User not found")
+
+    end_date = end_date or (date.today() - timedelta(days=1))
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+
+    return SnapshotBackfillService.backfill_user(db, user_id, start_date, end_date)
 
 
 # --- Read Endpoint (for Frontend) ---
@@ -52,22 +100,95 @@ def trigger_daily_snapshot(
 def get_snapshots(
     start_date: Optional[date] = Query(None, description="Start date in YYYY-MM-DD format"),
     end_date: Optional[date] = Query(None, description="End date in YYYY-MM-DD format"),
+    resolution: models.SnapshotResolution = Query(
+        models.SnapshotResolution.DAY, description="day, or one closing snapshot per week / month"
+    ),
+    response_format: Literal["rows", "columnar"] = Query(
+        "rows", alias="format", description="rows: one object per snapshot. columnar: parallel arrays for charts"
+    ),
+    currency: str = Query("TWD", description="Base currency; one of the captured snapshot currencies"),
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """
     Fetch historical asset snapshots for the authenticated user to display on a trend chart.
     Defaults to the last 365 days if no date range is provided.
+    With resolution=week|month, each period is represented by its latest snapshot,
+    read from the precomputed rollups.
+    With format=columnar, returns {"dates", "total_net_worth", "breakdown": {asset_type: [...]}}
+    as parallel arrays, built straight from the selected columns.
+    Values are stored per currency at capture time, so currency=USD reads the
+    USD rows (valued at each day's rates) instead of converting TWD history.
     """
+    currency = currency.upper()
+    if currency not in SNAPSHOT_CURRENCIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Snapshots are not captured in {currency}. Available: {', '.join(SNAPSHOT_CURRENCIES)}",
+        )
+
     if not end_date:
         end_date = date.today()
     if not start_date:
         start_date = end_date - timedelta(days=365)
 
-    snapshots = db.query(models.AssetSnapshot).filter(
-        models.AssetSnapshot.user_id == current_user.uid,
-        models.AssetSnapshot.snapshot_date >= start_date,
-        models.AssetSnapshot.snapshot_date <= end_date
-    ).order_by(models.AssetSnapshot.snapshot_date.asc()).all()
+    if resolution != models.SnapshotResolution.DAY:
+        table = models.AssetSnapshotRollup
+        filters = [
+            table.currency == currency,
+            table.resolution == resolution,
+            table.period_start >= get_period_start(start_date, resolution),
+            table.period_start <= end_date,
+        ]
+        order_by = table.period_start
+    else:
+        table = models.AssetSnapshot
+        filters = [
+            table.currency == currency,
+            table.snapshot_date >= start_date,
+            table.snapshot_date <= end_date,
+        ]
+        order_by = table.snapshot_date
+
+    if response_format == "columnar":
+        rows = db.query(table.snapshot_date, table.total_net_worth, table.breakdown).filter(
+            table.user_id == current_user.uid, *filters
+        ).order_by(order_by.asc()).all()
+        # Returned as a Response so FastAPI skips response_model validation
+        return JSONResponse(to_columnar(rows))
+
+    snapshots = db.query(table).filter(
+        table.user_id == current_user.uid, *filters
+    ).order_by(order_by.asc()).all()
     
     return snapshots
+
+
+@router.get(
+    "/assets/{asset_id}",
+    response_model=List[schemas.AssetValuationSnapshotResponse],
+    summary="Get the daily valuation history of one asset",
+)
+def get_asset_snapshots(
+    asset_id: int,
+    start_date: Optional[date] = Query(None, description="Start date in YYYY-MM-DD format"),
+    end_date: Optional[date] = Query(None, description="End date in YYYY-MM-DD format"),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Quantity, price, FX rate and base-currency value of one asset per snapshot day.
+    Defaults to the last 365 days; served by the (user_id, asset_id, snapshot_date) index.
+    """
+    if not end_date:
+        end_date = date.today()
+    if not start_date:
+        start_date = end_date - timedelta(days=365)
+
+    table = models.AssetValuationSnapshot
+    return db.query(table).filter(
+        table.user_id == current_user.uid,
+        table.asset_id == asset_id,
+        table.snapshot_date >= start_date,
+        table.snapshot_date <= end_date,
+    ).order_by(table.snapshot_date.asc()).all()
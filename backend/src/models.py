@@ -10,9 +10,11 @@ from sqlalchemy import (
     Enum,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     UniqueConstraint,
+    text,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.mutable import MutableDict
@@ -47,6 +49,18 @@ class TransactionType(str, enum.Enum):
     INTEREST = "INTEREST"  # 利息/股息
     
     
+class SnapshotResolution(str, enum.Enum):
+    DAY = "day"  # 日
+    WEEK = "week"  # 週 (週一起算)
+    MONTH = "month"  # 月
+
+
+class SnapshotJobStatus(str, enum.Enum):
+    RUNNING = "RUNNING"  # 執行中 (或中斷待續跑)
+    COMPLETED = "COMPLETED"  # 完成
+    FAILED = "FAILED"  # 失敗 (可續跑)
+
+
 class UserRole(str, enum.Enum):
     OWNER = "OWNER"      # 專案擁有者
     ADMIN = "ADMIN"      # 管理員
@@ -136,6 +150,9 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
     last_login_at = Column(DateTime, nullable=True)
+    # Bumped with every change to the user's assets; cached holdings carry the
+    # value they were loaded at, so every instance can tell they are stale
+    holdings_version = Column(Integer, nullable=False, default=0, server_default="0")
     has_seen_friend_code_prompt = Column(
         Boolean, nullable=False, default=False, server_default="0"
     )
@@ -163,11 +180,205 @@ class AssetSnapshot(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String, ForeignKey("users.uid"), nullable=False, index=True)
     snapshot_date = Column(Date, nullable=False, index=True)
+    # Base currency of total_net_worth and breakdown; one row per captured currency
+    currency = Column(String(3), nullable=False, default="TWD", server_default="TWD")
     
     total_net_worth = Column(Float, nullable=False)
 
     breakdown = Column(MutableDict.as_mutable(JSON), default=dict)
 
     __table_args__ = (
-        UniqueConstraint('user_id', 'snapshot_date', name='_user_date_uc'),
+        UniqueConstraint('user_id', 'snapshot_date', 'currency', name='_user_date_currency_uc'),
+    )
+
+
+class AssetSnapshotRollup(Base):
+    """
+    Closing (latest) snapshot of each week or month, kept in step with
+    asset_snapshots so long-range charts read one row per period.
+    """
+
+    __tablename__ = "asset_snapshot_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String, ForeignKey("users.uid"), nullable=False, index=True)
+    resolution = Column(Enum(SnapshotResolution), nullable=False)
+    # Monday of the week / first day of the month
+    period_start = Column(Date, nullable=False)
+    # The day whose snapshot this row holds
+    snapshot_date = Column(Date, nullable=False)
+    currency = Column(String(3), nullable=False, default="TWD", server_default="TWD")
+
+    total_net_worth = Column(Float, nullable=False)
+
+    breakdown = Column(MutableDict.as_mutable(JSON), default=dict)
+
+    __table_args__ = (
+        UniqueConstraint(
+            'user_id', 'resolution', 'period_start', 'currency', name='_user_resolution_period_currency_uc'
+        ),
+    )
+
+
+class AssetValuationSnapshot(Base):
+    """
+    One ACTIVE asset's valuation on a snapshot day, written alongside
+    asset_snapshots so per-holding history is a range scan instead of a replay.
+    """
+
+    __tablename__ = "asset_valuation_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String, ForeignKey("users.uid"), nullable=False)
+    asset_id = Column(Integer, ForeignKey("assets.id"), nullable=False)
+    snapshot_date = Column(Date, nullable=False)
+
+    quantity = Column(Float, nullable=False, default=0.0)
+    # Unit price in the asset's currency (average cost if unpriced); NULL for book-value assets
+    price = Column(Float, nullable=True)
+    # Asset currency -> base currency
+    fx_rate = Column(Float, nullable=False, default=1.0)
+    base_value = Column(Float, nullable=False)
+
+    __table_args__ = (
+        # Also the index for per-asset history: user_id = ? AND asset_id = ? AND snapshot_date BETWEEN ...
+        UniqueConstraint('user_id', 'asset_id', 'snapshot_date', name='_user_asset_date_uc'),
+    )
+
+
+class SnapshotJob(Base):
+    """
+    One capture-all run for a snapshot date. Users are processed in uid order
+    and last_uid checkpoints progress, so an interrupted run resumes after it.
+    """
+
+    __tablename__ = "snapshot_jobs"
+
+    id = Column(String, primary_key=True)
+    snapshot_date = Column(Date, nullable=False, index=True)
+    status = Column(Enum(SnapshotJobStatus), nullable=False, default=SnapshotJobStatus.RUNNING)
+
+    total_users = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+
+    # Every user with uid <= last_uid is done
+    last_uid = Column(String, nullable=True)
+    # [{"uid": ..., "error": ...}] for users that failed
+    failures = Column(JSON, default=list)
+    error = Column(String, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.now)
+    # Doubles as a heartbeat: a RUNNING job that stops updating was interrupted
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # At most one RUNNING job per date, across every instance and worker
+        Index(
+            'uq_snapshot_jobs_running_date',
+            'snapshot_date',
+            unique=True,
+            postgresql_where=text("status = 'RUNNING'"),
+            sqlite_where=text("status = 'RUNNING'"),
+        ),
+    )
+
+    @property
+    def remaining(self) -> int:
+        return max((self.total_users or 0) - (self.processed or 0), 0)
+
+
+class PriceQuote(Base):
+    """
+    Last known market price per symbol per day (stocks like 'AAPL', FX like 'TWD=X').
+    Written through from the market service so restarts can warm their caches,
+    and kept per day so it doubles as a coarse price history.
+    """
+    __tablename__ = "price_quotes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String, nullable=False, index=True)
+    quote_date = Column(Date, nullable=False, index=True)
+
+    price = Column(Float, nullable=False)
+    currency = Column(String(3), nullable=True)
+
+    fetched_at = Column(DateTime, nullable=False, default=datetime.now, index=True)
+
+    __table_args__ = (
+        UniqueConstraint('symbol', 'quote_date', name='_symbol_quote_date_uc'),
+    )
+
+
+class TickerResolution(Base):
+    """
+    Which Yahoo symbol a user-entered ticker resolved to in a region
+    (e.g. '8069' in TW -> '8069.TWO'). resolved_symbol is NULL when no
+    candidate was found; such rows only count until the not-found TTL passes.
+    """
+    __tablename__ = "ticker_resolutions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String, nullable=False)
+    region = Column(String, nullable=False)
+
+    resolved_symbol = Column(String, nullable=True)
+    checked_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        UniqueConstraint('symbol', 'region', name='_symbol_region_uc'),
     )
+
+
+class StockProfile(Base):
+    """
+    Company profile shared by every holder of a (symbol, region), so the slow
+    upstream profile call runs once per symbol instead of once per asset.
+    website is NULL when the lookup found none; such rows are retried later.
+    """
+    __tablename__ = "stock_profiles"
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String, nullable=False)
+    region = Column(String, nullable=False)
+
+    resolved_symbol = Column(String, nullable=True)
+    website = Column(String, nullable=True)
+    fetched_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        UniqueConstraint('symbol', 'region', name='_profile_symbol_region_uc'),
+    )
+
+
+class PriceHistory(Base):
+    """
+    Daily close per symbol ('AAPL', '2330.TW') and per USD FX leg ('TWD=X').
+    Filled incrementally from bulk downloads; only ranges not yet tried
+    (see PriceHistoryRange) are fetched.
+    """
+    __tablename__ = "price_history"
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String, nullable=False)
+    price_date = Column(Date, nullable=False)
+    close = Column(Float, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('symbol', 'price_date', name='_history_symbol_date_uc'),
+    )
+
+
+class PriceHistoryRange(Base):
+    """
+    Date range already requested from the provider for a symbol, whether or
+    not it returned closes (weekends, holidays, before listing). Adjacent and
+    overlapping ranges are merged, so each symbol keeps only a few rows.
+    """
+    __tablename__ = "price_history_ranges"
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String, nullable=False, index=True)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
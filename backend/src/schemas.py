@@ -1,5 +1,5 @@
 from datetime import date, datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 from src import models
@@ -95,6 +95,7 @@ class AssetUpdate(BaseModel):
 
 class AssetSnapshotResponse(BaseModel):
     snapshot_date: date
+    currency: str
     total_net_worth: float
     breakdown: Dict[str, Any]
 
@@ -102,6 +103,50 @@ class AssetSnapshotResponse(BaseModel):
         orm_mode = True
 
 
+class AssetValuationSnapshotResponse(BaseModel):
+    snapshot_date: date
+    quantity: float
+    # None for book-value assets (cash, liabilities, ...)
+    price: Optional[float] = None
+    fx_rate: float
+    base_value: float
+
+    class Config:
+        orm_mode = True
+
+
+class SnapshotJobFailure(BaseModel):
+    uid: str
+    error: str
+
+
+class SnapshotJobResponse(BaseModel):
+    id: str
+    snapshot_date: date
+    status: models.SnapshotJobStatus
+    total_users: int
+    processed: int
+    failed: int
+    remaining: int
+    failures: List[SnapshotJobFailure] = []
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+
+class SnapshotBackfillResponse(BaseModel):
+    uid: str
+    # Snapshot counts (one per day and currency): written, failed to write,
+    # and skipped (before the user's first transaction)
+    created: int
+    failed: int
+    skipped: int
+
+
 class AssetResponse(BaseModel):
     id: int
     name: str
@@ -128,6 +173,34 @@ class StockPriceResponse(BaseModel):
     currency: str
 
 
+class StockPriceBatchResponse(BaseModel):
+    # Keyed by the ticker as requested (e.g. "2330"), not the resolved symbol
+    quotes: Dict[str, StockPriceResponse]
+    not_found: List[str] = []
+
+
+class PriceSeries(BaseModel):
+    symbol: str
+    dates: List[date]
+    closes: List[float]
+
+
+class PriceHistoryResponse(BaseModel):
+    start_date: date
+    end_date: date
+    # Keyed by the ticker as requested (e.g. "2330")
+    stocks: Dict[str, PriceSeries]
+    # Keyed by currency code; closes are USD -> currency rates
+    fx: Dict[str, PriceSeries]
+
+
+class PortfolioValuationResponse(BaseModel):
+    base_currency: str
+    total_net_worth: float
+    breakdown: Dict[str, float]
+    updated_at: datetime
+
+
 class ExchangeRateResponse(BaseModel):
     from_currency: str = Field(..., alias="from")
     to_currency: str = Field(..., alias="to")
@@ -136,7 +209,15 @@ class ExchangeRateResponse(BaseModel):
 
     class Config:
         populate_by_name = True # Allows using "from_currency" in code
-        
+
+
+class ExchangeRateBatchResponse(BaseModel):
+    base: str
+    # Keyed by source currency; 1 unit of the key currency = rate units of base
+    rates: Dict[str, float]
+    updated_at: datetime
+
+
 class UserRead(BaseModel):
     uid: str
     email: Optional[str]
@@ -4,9 +4,7 @@ from typing import List
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from src import models, schemas
-from src.database import SessionLocal
-
-from .market import get_stock_profile
+from src.services.valuation_service import holdings_cache
 
 
 class AssetService:
@@ -155,7 +153,9 @@ class AssetService:
                 db.add(initial_tx)
 
             # 🛡️ 5. Commit All Changes
+            holdings_cache.touch(db, current_user)
             db.commit()
+            holdings_cache.invalidate(current_user)
             db.refresh(db_asset)
             return db_asset
 
@@ -183,7 +183,9 @@ class AssetService:
         for key, value in update_data.items():
             setattr(asset, key, value)
 
+        holdings_cache.touch(db, current_user)
         db.commit()
+        holdings_cache.invalidate(current_user)
         db.refresh(asset)
         return asset
 
@@ -200,34 +202,10 @@ class AssetService:
         if not asset:
             raise HTTPException(status_code=404, detail="Asset not found")
 
+        db.query(models.AssetValuationSnapshot).filter(
+            models.AssetValuationSnapshot.asset_id == asset_id
+        ).delete()
         db.delete(asset)
+        holdings_cache.touch(db, current_user)
         db.commit()
-
-    @staticmethod
-    def fetch_and_update_logo(asset_id: int):
-        db = SessionLocal()
-        try:
-            asset = db.query(models.Asset).filter(models.Asset.id == asset_id).first()
-
-            if not asset:
-                return
-
-            symbol = asset.symbol
-            region = asset.meta_data.get("region", "US")
-
-            try:
-                profile = get_stock_profile(symbol, region)
-
-                if not profile:
-                    return
-
-                asset.meta_data["website"] = profile.get("website")
-                asset.meta_data["logo_url"] = profile.get("logo_url")
-
-                db.commit()
-
-            except Exception:
-                return
-
-        finally:
-            db.close()
+        holdings_cache.invalidate(current_user)
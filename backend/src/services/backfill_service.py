@@ -0,0 +1,344 @@
+import argparse
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+from src import models
+from src.database import SessionLocal
+from src.services import market
+from src.services.prefetch_service import MARKET_ASSET_TYPES
+from src.services.snapshot_service import SNAPSHOT_CURRENCIES, SNAPSHOT_PRIMARY_CURRENCY, SnapshotService
+from src.services.valuation_service import ASSET_TYPES, ASSET_TYPE_INDEX, LIABILITY_TYPES
+
+# Closes this many days before the first missing day are loaded so weekends
+# and holidays at the start of the range can carry the previous close forward
+PRICE_LOOKBACK_DAYS = 7
+
+
+class SnapshotBackfillService:
+    """
+    Rebuilds missing daily snapshots by replaying a user's transactions and
+    valuing each day's holdings against stored daily closes and FX history.
+    """
+
+    @staticmethod
+    def get_missing_dates(
+        db: Session, user_id: str, start: date, end: date, currency: str = SNAPSHOT_PRIMARY_CURRENCY
+    ) -> List[date]:
+        """Days in start..end without a snapshot for the user in currency, in order."""
+        existing = {
+            d
+            for (d,) in db.query(models.AssetSnapshot.snapshot_date).filter(
+                models.AssetSnapshot.user_id == user_id,
+                models.AssetSnapshot.currency == currency,
+                models.AssetSnapshot.snapshot_date >= start,
+                models.AssetSnapshot.snapshot_date <= end,
+            )
+        }
+        all_days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        return [d for d in all_days if d not in existing]
+
+    @staticmethod
+    def backfill_user(
+        db: Session, user_id: str, start: date, end: date, currencies: Optional[List[str]] = None
+    ) -> dict:
+        """
+        Create snapshots for the days in start..end that have none, in each of
+        currencies (default: SNAPSHOT_CURRENCIES). Days before the user's first
+        transaction are skipped, and end is capped at yesterday since today's
+        snapshot is taken by capture-all.
+
+        Logic matches ValuationService.value_holdings, applied to each past day:
+        holdings are rebuilt from the transactions dated on or before that day,
+        market assets are priced at that day's close (the last earlier close on
+        non-trading days, average cost if there is none), and currencies are
+        converted at that day's USD cross rates. Every currency is filled from
+        the same replay; only the FX step differs.
+
+        Returns:
+            dict: {"uid", "created", "failed", "skipped"} snapshot counts
+                (one snapshot per day and currency).
+        """
+        currencies = [c.upper() for c in currencies] if currencies else SNAPSHOT_CURRENCIES
+        end = min(end, date.today() - timedelta(days=1))
+        missing = {
+            currency: set(SnapshotBackfillService.get_missing_dates(db, user_id, start, end, currency))
+            for currency in currencies
+        } if start <= end else {}
+        days = sorted(set().union(*missing.values()))
+        result = {"uid": user_id, "created": 0, "failed": 0, "skipped": 0}
+        if not days:
+            return result
+
+        assets = (
+            db.query(
+                models.Asset.id,
+                models.Asset.asset_type,
+                models.Asset.currency,
+                models.Asset.symbol,
+                models.Asset.meta_data,
+                models.Asset.include_in_net_worth,
+            )
+            .filter(models.Asset.user_id == user_id)
+            .all()
+        )
+        ledgers = SnapshotBackfillService._replay(db, user_id, {a.id: a.asset_type for a in assets}, days[-1])
+
+        day_ordinals = np.array([d.toordinal() for d in days])
+        prices = SnapshotBackfillService._load_prices(assets, days)
+        fx = SnapshotBackfillService._load_fx({(a.currency or "TWD").upper() for a in assets}, currencies, days)
+
+        n_days = len(days)
+        # Indexed [currency, (type,) day]
+        totals = np.zeros((len(currencies), n_days))
+        type_sums = np.zeros((len(currencies), len(ASSET_TYPES), n_days))
+        type_present = np.zeros((len(ASSET_TYPES), n_days), dtype=bool)
+        any_asset = np.zeros(n_days, dtype=bool)
+
+        for asset in assets:
+            ledger = ledgers.get(asset.id)
+            if ledger is None:
+                continue
+            event_days, quantity, book_value = ledger
+
+            # Position after the last transaction on or before each day (-1: not yet held)
+            idx = np.searchsorted(event_days, day_ordinals, side="right") - 1
+            exists = idx >= 0
+            qty = np.where(exists, quantity[np.maximum(idx, 0)], 0.0)
+            book = np.where(exists, book_value[np.maximum(idx, 0)], 0.0)
+
+            if asset.asset_type in MARKET_ASSET_TYPES:
+                held = qty > 0.000001
+                average_cost = np.divide(book, qty, out=np.zeros(n_days), where=held)
+                price = prices.get(asset.id, np.full(n_days, np.nan))
+                price = np.where(price > 0, price, average_cost)
+                native_value = np.where(held, qty * price, 0.0)
+            else:
+                native_value = book
+
+            asset_currency = (asset.currency or "TWD").upper()
+            rates = np.stack([fx[currency][asset_currency] for currency in currencies])
+            base_value = np.where(exists, native_value, 0.0) * rates
+
+            any_asset |= exists
+            if asset.include_in_net_worth:
+                totals += base_value
+            if asset.include_in_net_worth or asset.asset_type in LIABILITY_TYPES:
+                t = ASSET_TYPE_INDEX[asset.asset_type]
+                type_sums[:, t] += base_value
+                type_present[t] |= exists
+
+        snapshots = []
+        for c, currency in enumerate(currencies):
+            for i, day in enumerate(days):
+                if day not in missing[currency]:
+                    continue
+                if not any_asset[i]:
+                    result["skipped"] += 1
+                    continue
+                breakdown = {
+                    ASSET_TYPES[t].value: float(type_sums[c, t, i]) for t in np.flatnonzero(type_present[:, i])
+                }
+                snapshots.append((user_id, day, currency, float(totals[c, i]), breakdown))
+
+        errors = SnapshotService.bulk_upsert_snapshots(db, snapshots)
+        db.commit()
+
+        result["created"] = len(snapshots) - len(errors)
+        result["failed"] = len(errors)
+        return result
+
+    @staticmethod
+    def _replay(
+        db: Session, user_id: str, asset_types: Dict[int, models.AssetType], until: date
+    ) -> Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Replay the transaction log the way TransactionService applies it.
+        Returns:
+            dict: asset_id -> (day ordinals, quantity, book_value); the running
+                position at the end of each day that has transactions.
+        """
+        rows = (
+            db.query(
+                models.Transaction.asset_id,
+                models.Transaction.transaction_type,
+                models.Transaction.amount,
+                models.Transaction.quantity_change,
+                models.Transaction.realized_pnl,
+                models.Transaction.transaction_date,
+            )
+            .filter(
+                models.Transaction.user_id == user_id,
+                models.Transaction.transaction_date < datetime.combine(until + timedelta(days=1), time.min),
+            )
+            .order_by(models.Transaction.transaction_date, models.Transaction.id)
+            .all()
+        )
+
+        events: Dict[int, Tuple[List[int], List[float], List[float]]] = {}
+        for asset_id, tx_type, amount, quantity_change, realized_pnl, tx_date in rows:
+            asset_type = asset_types.get(asset_id)
+            if asset_type is None or tx_date is None:
+                continue
+            quantity_change = quantity_change or 0.0
+
+            if asset_type in MARKET_ASSET_TYPES:
+                if tx_type == models.TransactionType.INITIAL:
+                    book_change = amount
+                elif quantity_change > 0:  # BUY adds its cost
+                    book_change = abs(amount)
+                elif quantity_change < 0:  # SELL removes the cost of the sold units
+                    book_change = -(amount - (realized_pnl or 0.0))
+                elif tx_type == models.TransactionType.TRANSFER_OUT:  # used as a funding source
+                    book_change = amount
+                else:
+                    book_change = 0.0
+                qty_change = quantity_change
+            else:
+                book_change = amount
+                qty_change = quantity_change if quantity_change != 0 else amount
+
+            days, qty, book = events.setdefault(asset_id, ([], [], []))
+            days.append(tx_date.date().toordinal())
+            qty.append(qty_change)
+            book.append(book_change)
+
+        ledgers = {}
+        for asset_id, (days, qty, book) in events.items():
+            event_days = np.array(days)
+            # Keep only the last running total of each day
+            last_of_day = np.append(event_days[1:] != event_days[:-1], True)
+            ledgers[asset_id] = (
+                event_days[last_of_day],
+                np.cumsum(qty)[last_of_day],
+                np.cumsum(book)[last_of_day],
+            )
+        return ledgers
+
+    @staticmethod
+    def _load_prices(assets: list, days: List[date]) -> Dict[int, np.ndarray]:
+        """Daily close per market asset id for each day, NaN where none is known."""
+        # (ticker as entered, region), the keys market.py caches resolutions under
+        asset_keys: Dict[int, Tuple[str, str]] = {}
+        for asset in assets:
+            if asset.asset_type in MARKET_ASSET_TYPES and asset.symbol:
+                region = asset.meta_data.get("region", "US") if asset.meta_data else "US"
+                asset_keys[asset.id] = (asset.symbol.upper().strip(), region)
+        if not asset_keys:
+            return {}
+
+        tickers_by_region: Dict[str, List[str]] = {}
+        for ticker, region in set(asset_keys.values()):
+            tickers_by_region.setdefault(region, []).append(ticker)
+
+        try:
+            symbols: Dict[Tuple[str, str], str] = {}
+            for region, tickers in tickers_by_region.items():
+                resolved = market.resolve_symbols(tickers, {ticker: region for ticker in tickers})
+                symbols.update({(ticker, region): symbol for ticker, symbol in resolved.items()})
+            history = market.get_price_history(
+                list(set(symbols.values())), days[0] - timedelta(days=PRICE_LOOKBACK_DAYS), days[-1]
+            )
+        except Exception as e:
+            print(f"Failed to load price history for backfill: {e}")
+            return {}
+
+        prices = {}
+        for asset_id, key in asset_keys.items():
+            series = history.get(symbols.get(key))
+            if series:
+                prices[asset_id] = _sample(series, days)
+        return prices
+
+    @staticmethod
+    def _load_fx(
+        currencies: set, base_currencies: List[str], days: List[date]
+    ) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Rate from each currency to each base currency for each day, from USD
+        cross-rate history loaded once for all of them. Days without history
+        use today's rate, or 1.0 if that fails too.
+
+        Returns:
+            dict: base currency -> currency -> daily rates.
+        """
+        needed = {
+            c for c in currencies | set(base_currencies) if c in market.SUPPORTED_CURRENCIES and c != "USD"
+        }
+        fx_symbols = {c: market.fx_symbol(c) for c in needed}
+
+        history = {}
+        if fx_symbols:
+            try:
+                history = market.get_price_history(
+                    list(set(fx_symbols.values())), days[0] - timedelta(days=PRICE_LOOKBACK_DAYS), days[-1]
+                )
+            except Exception as e:
+                print(f"Failed to load FX history for backfill: {e}")
+
+        usd_legs: Dict[str, np.ndarray] = {}
+
+        def usd_to(currency: str) -> np.ndarray:
+            if currency not in usd_legs:
+                if currency == "USD":
+                    usd_legs[currency] = np.ones(len(days))
+                else:
+                    series = history.get(fx_symbols.get(currency))
+                    usd_legs[currency] = _sample(series, days) if series else np.full(len(days), np.nan)
+            return usd_legs[currency]
+
+        rates: Dict[str, Dict[str, np.ndarray]] = {}
+        for base_currency in base_currencies:
+            base_leg = usd_to(base_currency)
+            rates[base_currency] = {}
+            for currency in currencies:
+                if currency == base_currency:
+                    rates[base_currency][currency] = np.ones(len(days))
+                    continue
+                # Rate(A -> B) = Rate(USD -> B) / Rate(USD -> A)
+                rate = base_leg / usd_to(currency)
+                if not np.isfinite(rate).all():
+                    try:
+                        fallback = market.rate_matrix.get_rate(currency, base_currency)
+                    except Exception:
+                        fallback = 1.0
+                    rate = np.where(np.isfinite(rate), rate, fallback)
+                rates[base_currency][currency] = rate
+        return rates
+
+
+def _sample(series: Tuple[List[date], List[float]], days: List[date]) -> np.ndarray:
+    """Value of a (dates, closes) series on each day, carrying the last close forward."""
+    dates, closes = series
+    if not dates:
+        return np.full(len(days), np.nan)
+    idx = np.searchsorted(
+        np.array([d.toordinal() for d in dates]), [d.toordinal() for d in days], side="right"
+    ) - 1
+    return np.where(idx >= 0, np.array(closes, dtype=float)[np.maximum(idx, 0)], np.nan)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Backfill missing daily asset snapshots.")
+    parser.add_argument("--user", action="append", dest="users", help="User uid (repeatable). Defaults to all users.")
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, help="YYYY-MM-DD. Defaults to yesterday.")
+    args = parser.parse_args(argv)
+
+    end = args.end or date.today() - timedelta(days=1)
+    db = SessionLocal()
+    try:
+        user_ids = args.users or [uid for (uid,) in db.query(models.User.uid).all()]
+        for user_id in user_ids:
+            try:
+                print(SnapshotBackfillService.backfill_user(db, user_id, args.start, end))
+            except Exception as e:
+                db.rollback()
+                print(f"Failed backfill for user {user_id}: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
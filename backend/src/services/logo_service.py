@@ -0,0 +1,90 @@
+import queue
+import threading
+from typing import Dict, Optional, Set
+
+from src import models
+from src.database import SessionLocal
+from src.services import market
+
+LOGO_QUEUE_WORKERS = 2
+
+
+class LogoFetchQueue:
+    """
+    Deduplicating background queue for stock logo lookups.
+
+    Jobs are keyed by (symbol, region): while one is queued or running, later
+    requests for the same key only add their asset id to it. One profile lookup
+    then updates every waiting asset, so N users adding AAPL cost one call.
+    """
+
+    def __init__(self, workers: int = LOGO_QUEUE_WORKERS):
+        self.workers = workers
+        self._queue: "queue.Queue[tuple[str, str, str]]" = queue.Queue()
+        self._pending: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+
+    def enqueue(self, asset_id: int, symbol: str, region: Optional[str]) -> None:
+        region = region or "US"
+        key = f"{region}:{symbol.upper().strip()}"
+
+        with self._lock:
+            self._ensure_workers()
+            if key in self._pending:
+                self._pending[key].add(asset_id)
+                return
+            self._pending[key] = {asset_id}
+
+        self._queue.put((key, symbol, region))
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _ensure_workers(self) -> None:
+        """Start worker threads on first use. Caller must hold the lock."""
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"logo-fetch-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self) -> None:
+        while True:
+            key, symbol, region = self._queue.get()
+            try:
+                profile = market.get_stock_profile(symbol, region)
+            except Exception as e:
+                print(f"Logo fetch failed for {key}: {e}")
+                profile = None
+
+            # Ids added after this point start a new (cached, cheap) job
+            with self._lock:
+                asset_ids = self._pending.pop(key, set())
+
+            if profile and asset_ids:
+                self._apply_profile(asset_ids, profile)
+
+            self._queue.task_done()
+
+    @staticmethod
+    def _apply_profile(asset_ids: Set[int], profile: dict) -> None:
+        db = SessionLocal()
+        try:
+            assets = db.query(models.Asset).filter(models.Asset.id.in_(asset_ids)).all()
+            for asset in assets:
+                if asset.meta_data is None:
+                    asset.meta_data = {}
+                asset.meta_data["website"] = profile.get("website")
+                asset.meta_data["logo_url"] = profile.get("logo_url")
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Failed to update logos for assets {sorted(asset_ids)}: {e}")
+        finally:
+            db.close()
+
+
+logo_queue = LogoFetchQueue()
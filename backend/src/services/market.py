@@ -1,10 +1,60 @@
-import yfinance as yf
-from src.utils import TTLCache
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any, Callable
+
+import numpy as np
+from src.database import SessionLocal
+from src.services.market_providers import (
+    MarketDataProvider,
+    SymbolNotFoundError,
+    get_market_data_provider,
+)
+from src.services.price_history_service import PriceHistoryService
+from src.services.quote_store_service import (
+    QuoteStoreService,
+    StockProfileService,
+    TickerResolutionService,
+)
+from src.utils import CircuitBreaker, CircuitOpenError, SingleFlight, TTLCache
 from urllib.parse import urlparse
 import os
 
 LOGO_DEV_TOKEN = os.getenv("LOGO_DEV_TOKEN")
 
+# Stored quotes younger than this are loaded into the caches at startup
+QUOTE_WARM_MAX_AGE_SECONDS = int(os.getenv("QUOTE_WARM_MAX_AGE_SECONDS", "900"))
+
+# Fetched quotes are buffered and written to price_quotes in one batch at most this often
+QUOTE_STORE_FLUSH_SECONDS = float(os.getenv("QUOTE_STORE_FLUSH_SECONDS", "5"))
+
+# Stale-while-revalidate grace windows (0 = disabled). Within the window an
+# expired entry is served immediately and refreshed in the background; past
+# TTL + window the lookup blocks on Yahoo again.
+STOCK_CACHE_STALE_SECONDS = int(os.getenv("STOCK_CACHE_STALE_SECONDS", "0"))
+RATE_CACHE_STALE_SECONDS = int(os.getenv("RATE_CACHE_STALE_SECONDS", "0"))
+
+# How long a ticker that resolved to nothing is answered "not found" without asking upstream
+TICKER_NOT_FOUND_TTL_SECONDS = int(os.getenv("TICKER_NOT_FOUND_TTL_SECONDS", "600"))
+
+# Circuit breakers around the market data provider: after this many consecutive
+# failures (or calls slower than the latency budget) lookups fail fast and serve
+# last-known values, probing upstream again every recovery period. Unknown
+# symbols are answers, not failures, so typos cannot open them.
+MARKET_BREAKER_FAILURE_THRESHOLD = int(os.getenv("MARKET_BREAKER_FAILURE_THRESHOLD", "5"))
+MARKET_BREAKER_RECOVERY_SECONDS = float(os.getenv("MARKET_BREAKER_RECOVERY_SECONDS", "30"))
+MARKET_SLOW_CALL_SECONDS = float(os.getenv("MARKET_SLOW_CALL_SECONDS", "5"))
+# Company profiles (get_info) are much slower than quotes
+MARKET_PROFILE_SLOW_CALL_SECONDS = float(os.getenv("MARKET_PROFILE_SLOW_CALL_SECONDS", "15"))
+
+# Parallel currency lookups for downloaded symbols whose currency is neither
+# cached nor implied by the exchange suffix
+MARKET_CURRENCY_LOOKUP_WORKERS = int(os.getenv("MARKET_CURRENCY_LOOKUP_WORKERS", "8"))
+
+# Profiles without a website are looked up again after this long
+PROFILE_NOT_FOUND_TTL_SECONDS = int(os.getenv("PROFILE_NOT_FOUND_TTL_SECONDS", str(7 * 86400)))
+
 SUPPORTED_CURRENCIES = {
     "TWD",
     "JPY",
@@ -19,8 +69,254 @@ SUPPORTED_CURRENCIES = {
     "CAD",
 }
 
-stock_cache = TTLCache(ttl_seconds=60)
-rate_cache = TTLCache(ttl_seconds=300)
+# Exchange suffix -> trading currency (see normalize_ticker), so these symbols need no lookup
+SUFFIX_CURRENCIES = {".TWO": "TWD", ".TW": "TWD", ".T": "JPY"}
+
+# Where quotes, FX and profiles come from (Yahoo Finance unless MARKET_DATA_PROVIDER says otherwise)
+provider: MarketDataProvider = get_market_data_provider()
+
+# One breaker per call type, so slow profile or history downloads cannot
+# open the circuit for price quotes
+quote_breaker = CircuitBreaker(
+    "market-quotes",
+    failure_threshold=MARKET_BREAKER_FAILURE_THRESHOLD,
+    recovery_seconds=MARKET_BREAKER_RECOVERY_SECONDS,
+    slow_call_seconds=MARKET_SLOW_CALL_SECONDS,
+    ignored_exceptions=(SymbolNotFoundError,),
+)
+profile_breaker = CircuitBreaker(
+    "market-profiles",
+    failure_threshold=MARKET_BREAKER_FAILURE_THRESHOLD,
+    recovery_seconds=MARKET_BREAKER_RECOVERY_SECONDS,
+    slow_call_seconds=MARKET_PROFILE_SLOW_CALL_SECONDS,
+    ignored_exceptions=(SymbolNotFoundError,),
+)
+history_breaker = CircuitBreaker(
+    "market-history",
+    failure_threshold=MARKET_BREAKER_FAILURE_THRESHOLD,
+    recovery_seconds=MARKET_BREAKER_RECOVERY_SECONDS,
+    slow_call_seconds=MARKET_SLOW_CALL_SECONDS * 3,
+)
+
+stock_cache = TTLCache(ttl_seconds=60, stale_seconds=STOCK_CACHE_STALE_SECONDS)
+rate_cache = TTLCache(ttl_seconds=300, stale_seconds=RATE_CACHE_STALE_SECONDS)
+# Quote currency almost never changes, so keep it much longer than prices
+currency_cache = TTLCache(ttl_seconds=86400)
+# "REGION:TICKER" -> resolved symbol (e.g. "TW:8069" -> "8069.TWO"), and negative results
+resolution_cache = TTLCache(ttl_seconds=7 * 86400, max_size=10000)
+not_found_cache = TTLCache(ttl_seconds=TICKER_NOT_FOUND_TTL_SECONDS, max_size=10000)
+# "REGION:TICKER" -> {"symbol", "website"}, backed by the stock_profiles table
+profile_cache = TTLCache(ttl_seconds=86400, max_size=10000)
+
+# Concurrent cache misses for the same key share one upstream request
+_inflight = SingleFlight()
+
+# Background revalidation of stale entries
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="market-refresh")
+_refreshing: set[str] = set()
+_refreshing_lock = threading.Lock()
+
+# symbol -> (price, currency) waiting for the next price_quotes write
+_pending_quotes: dict[str, tuple[float, str]] = {}
+_pending_quotes_lock = threading.Lock()
+_quotes_flush_scheduled = False
+
+_currency_executor = ThreadPoolExecutor(
+    max_workers=MARKET_CURRENCY_LOOKUP_WORKERS, thread_name_prefix="market-currency"
+)
+
+
+def _get_cached(cache: TTLCache, key: str, refresh: Callable[[], Any]) -> Any | None:
+    """
+    Read a cache entry, serving stale values within the cache's grace window.
+    A stale hit schedules `refresh` in the background and returns the old value.
+    """
+    entry = cache.get_entry(key)
+    if entry is None:
+        return None
+
+    value, is_fresh = entry
+    if not is_fresh:
+        _refresh_in_background(key, refresh)
+    return value
+
+
+def _refresh_in_background(key: str, refresh: Callable[[], Any]) -> None:
+    """Run `refresh` on the refresh pool, at most once at a time per key."""
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def run():
+        try:
+            _inflight.do(key, refresh)
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            print(f"Background refresh failed for {key}: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    _refresh_executor.submit(run)
+
+
+def _refresh_quotes_in_background(symbols: list[str]) -> None:
+    """
+    Revalidate many stale quotes with one bulk download on the refresh pool.
+    Symbols already being refreshed (in bulk or one by one) are skipped.
+    """
+    with _refreshing_lock:
+        batch = [t for t in dict.fromkeys(symbols) if f"STOCK_{t}" not in _refreshing]
+        _refreshing.update(f"STOCK_{t}" for t in batch)
+    if not batch:
+        return
+
+    def run():
+        try:
+            _inflight.do(f"STOCK_BULK_{','.join(sorted(batch))}", lambda: _refresh_quotes(batch))
+        except Exception as e:
+            print(f"Background refresh failed for {len(batch)} quotes: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.difference_update(f"STOCK_{t}" for t in batch)
+
+    _refresh_executor.submit(run)
+
+
+def _refresh_quotes(symbols: list[str]) -> None:
+    """Download the latest price of each symbol in one request and store it in stock_cache."""
+    prices = _download_last_prices(symbols)
+    if not prices:
+        return
+    currencies = _get_quote_currencies(list(prices))
+
+    fetched = []
+    for t, price in prices.items():
+        currency = currencies.get(t)
+        if price and currency:
+            stock_cache.set(f"STOCK_{t}", {"symbol": t, "price": price, "currency": currency})
+            fetched.append((t, price, currency))
+    _store_quotes(fetched)
+
+
+def get_upstream_status() -> dict:
+    """
+    Circuit breaker state of the market data provider, per call type.
+    """
+    return {
+        "provider": provider.name,
+        "circuit_breakers": [
+            breaker.stats() for breaker in (quote_breaker, profile_breaker, history_breaker)
+        ],
+    }
+
+
+def get_cache_stats() -> dict:
+    """
+    Hit / miss / eviction counters of the market caches, for sizing them.
+    """
+    return {
+        "stock_cache": stock_cache.stats(),
+        "rate_cache": rate_cache.stats(),
+        "currency_cache": currency_cache.stats(),
+        "resolution_cache": resolution_cache.stats(),
+        "not_found_cache": not_found_cache.stats(),
+        "profile_cache": profile_cache.stats(),
+    }
+
+
+def warm_caches_from_store() -> int:
+    """
+    Load recently stored quotes, FX rates and ticker resolutions into the
+    in-memory caches, so a restarted worker does not have to hit Yahoo for
+    every held symbol.
+    Stored quotes keep their real age: one older than the cache TTL arrives
+    stale (served and revalidated within the grace window) or not at all.
+    Returns:
+        int: Number of cache entries loaded.
+    """
+    db = SessionLocal()
+    try:
+        quotes = QuoteStoreService.get_recent_quotes(db, QUOTE_WARM_MAX_AGE_SECONDS)
+        resolutions = TickerResolutionService.get_resolutions(db, TICKER_NOT_FOUND_TTL_SECONDS)
+    except Exception as e:
+        print(f"Failed to warm market caches: {e}")
+        return 0
+    finally:
+        db.close()
+
+    for resolution in resolutions:
+        key = _resolution_key(resolution.symbol, resolution.region)
+        if resolution.resolved_symbol:
+            resolution_cache.set(key, resolution.resolved_symbol)
+        else:
+            not_found_cache.set(key, True)
+
+    now = datetime.now()
+    for quote in quotes:
+        age = (now - quote.fetched_at).total_seconds()
+        if quote.symbol.endswith("=X"):
+            rate_cache.set(f"RATE_{quote.symbol}", quote.price, age_seconds=age)
+        elif quote.currency:
+            stock_cache.set(
+                f"STOCK_{quote.symbol}",
+                {"symbol": quote.symbol, "price": quote.price, "currency": quote.currency},
+                age_seconds=age,
+            )
+            currency_cache.set(f"CURRENCY_{quote.symbol}", quote.currency, age_seconds=age)
+
+    return len(quotes) + len(resolutions)
+
+
+def _store_quotes(quotes: list[tuple[str, float, str]]) -> None:
+    """
+    Queue fetched quotes for the price_quotes table. They are written together
+    by flush_quotes() within QUOTE_STORE_FLUSH_SECONDS, not one commit per quote.
+    """
+    global _quotes_flush_scheduled
+    if not quotes:
+        return
+
+    with _pending_quotes_lock:
+        for symbol, price, currency in quotes:
+            _pending_quotes[symbol] = (price, currency)
+        if _quotes_flush_scheduled:
+            return
+        _quotes_flush_scheduled = True
+
+    timer = threading.Timer(QUOTE_STORE_FLUSH_SECONDS, flush_quotes)
+    timer.daemon = True
+    timer.start()
+
+
+def flush_quotes() -> int:
+    """
+    Write every queued quote through to the price_quotes table in one transaction.
+    Persistence is best effort: a DB failure must never fail a price lookup.
+    Returns:
+        int: Number of quotes written.
+    """
+    global _quotes_flush_scheduled
+    with _pending_quotes_lock:
+        batch = [(symbol, price, currency) for symbol, (price, currency) in _pending_quotes.items()]
+        _pending_quotes.clear()
+        _quotes_flush_scheduled = False
+
+    if not batch:
+        return 0
+
+    db = SessionLocal()
+    try:
+        QuoteStoreService.save_quotes(db, batch)
+        return len(batch)
+    except Exception as e:
+        db.rollback()
+        print(f"Failed to store {len(batch)} quotes: {e}")
+        return 0
+    finally:
+        db.close()
 
 
 def normalize_ticker(ticker: str, region: str = "US") -> list[str]:
@@ -42,6 +338,56 @@ def normalize_ticker(ticker: str, region: str = "US") -> list[str]:
     return tickers_to_try
 
 
+def _resolution_key(ticker: str, region: str) -> str:
+    return f"{region}:{ticker.upper().strip()}"
+
+
+def _candidate_symbols(ticker: str, region: str) -> list[str]:
+    """
+    normalize_ticker() candidates, with the previously resolved symbol first
+    so e.g. OTC listings go straight to '.TWO' instead of failing on '.TW' first.
+    """
+    candidates = normalize_ticker(ticker, region)
+    resolved = resolution_cache.get(_resolution_key(ticker, region))
+    if resolved in candidates:
+        candidates.remove(resolved)
+        candidates.insert(0, resolved)
+    return candidates
+
+
+def _is_known_not_found(ticker: str, region: str) -> bool:
+    return not_found_cache.get(_resolution_key(ticker, region)) is not None
+
+
+def _record_resolutions(resolutions: list[tuple[str, str, str | None]]) -> None:
+    """
+    Remember which symbol each (ticker, region) resolved to, or None for not found,
+    in memory and in the ticker_resolutions table. Unchanged resolutions are skipped.
+    """
+    changed = []
+    for ticker, region, resolved in resolutions:
+        key = _resolution_key(ticker, region)
+        if resolved:
+            if resolution_cache.peek(key) == resolved:
+                continue
+            resolution_cache.set(key, resolved)
+        else:
+            not_found_cache.set(key, True)
+        changed.append((ticker.upper().strip(), region, resolved))
+
+    if not changed:
+        return
+
+    db = SessionLocal()
+    try:
+        TickerResolutionService.save_resolutions(db, changed)
+    except Exception as e:
+        db.rollback()
+        print(f"Failed to store ticker resolutions: {e}")
+    finally:
+        db.close()
+
+
 def get_stock_data(ticker: str, region: str = "US") -> dict:
     """
     Fetch stock information including price and currency.
@@ -54,27 +400,342 @@ def get_stock_data(ticker: str, region: str = "US") -> dict:
         ValueError: If the stock cannot be found for the given ticker and region.
     """
 
-    tickers_to_try = normalize_ticker(ticker, region)
+    if _is_known_not_found(ticker, region):
+        raise ValueError(f"無法找到股票: {ticker} (Region: {region})")
+
+    tickers_to_try = _candidate_symbols(ticker, region)
+    upstream_failed = False
 
     for t in tickers_to_try:
         try:
-            cached_data = stock_cache.get(f"STOCK_{t}")
+            cached_data = _get_cached(
+                stock_cache, f"STOCK_{t}", lambda t=t: _fetch_quote(t)
+            )
             if cached_data:
                 return cached_data
 
-            stock = yf.Ticker(t)
+            result_data = _inflight.do(f"STOCK_{t}", lambda: _fetch_quote(t))
+            if result_data:
+                _record_resolutions([(ticker, region, t)])
+                return result_data
+        except SymbolNotFoundError:
+            continue
+        except Exception:
+            # Circuit open, network error, timeout...
+            upstream_failed = True
+            continue
+
+    if upstream_failed:
+        # Upstream is degraded: serve the last stored price instead of failing,
+        # and do not mistake the outage for an unknown symbol.
+        last_known = _last_known_quotes(tickers_to_try)
+        for t in tickers_to_try:
+            if t in last_known:
+                return last_known[t]
+        raise ValueError(f"無法找到股票: {ticker} (Region: {region})")
+
+    _record_resolutions([(ticker, region, None)])
+    raise ValueError(f"無法找到股票: {ticker} (Region: {region})")
+
+
+def _last_known_quotes(symbols: list[str]) -> dict[str, dict]:
+    """
+    Latest stored quote per symbol from price_quotes (or still queued for it),
+    regardless of age. Used as a fallback while the upstream circuit is open.
+    """
+    if not symbols:
+        return {}
+
+    with _pending_quotes_lock:
+        pending = {symbol: _pending_quotes[symbol] for symbol in symbols if symbol in _pending_quotes}
+    quotes = {
+        symbol: {"symbol": symbol, "price": price, "currency": currency}
+        for symbol, (price, currency) in pending.items()
+    }
+    missing = [symbol for symbol in symbols if symbol not in quotes]
+    if not missing:
+        return quotes
+
+    db = SessionLocal()
+    try:
+        rows = QuoteStoreService.get_latest_quotes(db, missing)
+    except Exception as e:
+        print(f"Failed to read last known quotes: {e}")
+        return quotes
+    finally:
+        db.close()
+
+    for symbol, row in rows.items():
+        if row.currency:
+            quotes[symbol] = {"symbol": symbol, "price": row.price, "currency": row.currency}
+    return quotes
+
+
+def _fetch_quote(symbol: str) -> dict | None:
+    """
+    Fetch a single quote from the market data provider and store it in stock_cache.
+    Runs under single-flight, so at most one call per symbol is in progress.
+    Returns:
+        dict | None: {"symbol", "price", "currency"}, or None if the provider has no price.
+    """
+    # A previous flight may have filled the cache between our miss and now
+    cached_data = stock_cache.peek(f"STOCK_{symbol}")
+    if cached_data:
+        return cached_data
 
-            price = stock.fast_info.last_price
-            currency = stock.fast_info.currency
+    price, currency = quote_breaker.call(provider.get_quote, symbol)
+
+    if not (price and currency):
+        return None
+
+    result_data = {"symbol": symbol, "price": price, "currency": currency}
+    stock_cache.set(f"STOCK_{symbol}", result_data)
+    currency_cache.set(f"CURRENCY_{symbol}", currency)
+    _store_quotes([(symbol, price, currency)])
+    return result_data
+
+
+def get_stock_data_many(
+    tickers: list[str],
+    region_map: dict[str, str] | None = None,
+    force_refresh: bool = False,
+) -> dict[str, dict]:
+    """
+    Fetch stock information for many tickers with a single bulk download.
+    Args:
+        tickers: Stock symbols as entered by the user (e.g., ["2330", "AAPL"]).
+        region_map: Optional mapping of ticker -> region. Missing tickers default to "US".
+        force_refresh: Skip cached quotes and download every symbol (used by the prefetcher).
+    Returns:
+        dict: Requested ticker -> {"symbol", "price", "currency"}, same shape as
+            get_stock_data(). Tickers that cannot be resolved are left out.
+    """
+    region_map = region_map or {}
+    unique_tickers = [
+        ticker
+        for ticker in dict.fromkeys(tickers)
+        if not _is_known_not_found(ticker, region_map.get(ticker, "US"))
+    ]
+
+    # Candidate symbols per requested ticker, e.g. "8069" -> ["8069.TW", "8069.TWO"]
+    candidates = {
+        ticker: _candidate_symbols(ticker, region_map.get(ticker, "US"))
+        for ticker in unique_tickers
+    }
+
+    results: dict[str, dict] = {}
+    pending = dict(candidates)
+    attempt = 0
+    # Tickers with a candidate upstream could not answer for (outage, or no currency)
+    unanswered: set[str] = set()
+
+    # Each round downloads the next candidate of every unresolved ticker at once,
+    # so TW/TWO fallbacks cost one extra bulk call instead of one call per ticker.
+    while pending:
+        round_symbols = {
+            ticker: options[attempt]
+            for ticker, options in pending.items()
+            if attempt < len(options)
+        }
+        if not round_symbols:
+            break
+
+        to_download = []
+        stale = []
+        for ticker, t in round_symbols.items():
+            entry = None if force_refresh else stock_cache.get_entry(f"STOCK_{t}")
+            if entry and entry[0]:
+                results[ticker], is_fresh = entry
+                if not is_fresh:
+                    stale.append(t)
+            else:
+                to_download.append(t)
+        # Stale hits are served now and revalidated together, not one request each
+        if stale:
+            _refresh_quotes_in_background(stale)
+
+        prices = _download_last_prices(to_download)
+        if prices is None:
+            unanswered.update(ticker for ticker in round_symbols if ticker not in results)
+            prices = {}
+        currencies = _get_quote_currencies(list(prices))
+        fetched = []
+
+        for ticker, t in round_symbols.items():
+            if ticker in results:
+                continue
+
+            price = prices.get(t)
+            currency = currencies.get(t)
+            if price and not currency:
+                unanswered.add(ticker)
 
             if price and currency:
                 result_data = {"symbol": t, "price": price, "currency": currency}
                 stock_cache.set(f"STOCK_{t}", result_data)
-                return result_data
-        except Exception:
-            continue
+                results[ticker] = result_data
+                fetched.append((t, price, currency))
 
-    raise ValueError(f"無法找到股票: {ticker} (Region: {region})")
+        _store_quotes(fetched)
+
+        pending = {
+            ticker: options for ticker, options in pending.items() if ticker not in results
+        }
+        attempt += 1
+
+    resolutions = [
+        (ticker, region_map.get(ticker, "US"), results[ticker]["symbol"])
+        for ticker in results
+    ]
+    # Misses upstream answered for are unknown symbols and are negatively cached.
+    # Misses caused by an outage get the last stored price instead, and are
+    # asked again next time.
+    missing = {t: options for t, options in candidates.items() if t not in results}
+    outage = {t: options for t, options in missing.items() if t in unanswered}
+    if outage:
+        last_known = _last_known_quotes([s for options in outage.values() for s in options])
+        for ticker, options in outage.items():
+            for t in options:
+                if t in last_known:
+                    results[ticker] = last_known[t]
+                    break
+    resolutions += [
+        (ticker, region_map.get(ticker, "US"), None) for ticker in missing if ticker not in outage
+    ]
+    _record_resolutions(resolutions)
+
+    return results
+
+
+def get_cached_stock_data_many(
+    tickers: list[str], region_map: dict[str, str] | None = None
+) -> dict[str, dict]:
+    """
+    Quotes for many tickers without asking upstream: cached quotes (stale ones
+    included), then the last stored price. For callers whose bulk lookup
+    timed out, so they degrade instead of fanning out single requests.
+    Returns:
+        dict: Requested ticker -> {"symbol", "price", "currency"}; tickers with
+            nothing cached or stored are left out.
+    """
+    region_map = region_map or {}
+    candidates = {
+        ticker: _candidate_symbols(ticker, region_map.get(ticker, "US"))
+        for ticker in dict.fromkeys(tickers)
+    }
+
+    results: dict[str, dict] = {}
+    for ticker, options in candidates.items():
+        for t in options:
+            entry = stock_cache.get_entry(f"STOCK_{t}")
+            if entry is not None:
+                results[ticker] = entry[0]
+                break
+
+    missing = {t: options for t, options in candidates.items() if t not in results}
+    if missing:
+        last_known = _last_known_quotes([s for options in missing.values() for s in options])
+        for ticker, options in missing.items():
+            for t in options:
+                if t in last_known:
+                    results[ticker] = last_known[t]
+                    break
+    return results
+
+
+def _download_last_prices(symbols: list[str]) -> dict[str, float] | None:
+    """
+    Download the latest price for each symbol in one provider request.
+    Returns:
+        dict | None: Symbol -> last price, symbols without data left out.
+            None if upstream failed, so callers do not take the misses for unknown symbols.
+    """
+    if not symbols:
+        return {}
+
+    # An empty answer only signals an outage when it drops symbols known to
+    # trade; for never-seen symbols it just means they do not exist.
+    known = [s for s in symbols if _is_known_symbol(s)]
+
+    def lost_known(prices: dict[str, float]) -> bool:
+        return bool(known) and not any(s in prices for s in known)
+
+    try:
+        # Bulk requests get a larger latency budget than single lookups
+        prices = quote_breaker.call(
+            provider.get_last_prices,
+            symbols,
+            is_failure=lost_known,
+            slow_call_seconds=MARKET_SLOW_CALL_SECONDS * 3,
+        )
+    except Exception:
+        return None
+
+    return None if lost_known(prices) else prices
+
+
+def _is_known_symbol(symbol: str) -> bool:
+    """Whether symbol has been quoted recently (FX symbols always exist)."""
+    return (
+        symbol.endswith("=X")
+        or currency_cache.peek(f"CURRENCY_{symbol}") is not None
+        or stock_cache.peek(f"STOCK_{symbol}") is not None
+    )
+
+
+def _get_quote_currencies(symbols: list[str]) -> dict[str, str]:
+    """
+    Trading currency of many Yahoo symbols: from currency_cache, then from the
+    exchange suffix (e.g. '.TW' -> TWD), and only the rest from the provider,
+    looked up concurrently rather than one round trip after another.
+    Returns:
+        dict: Symbol -> currency. Symbols whose currency is unknown are left out.
+    """
+    currencies: dict[str, str] = {}
+    lookups = []
+    for symbol in symbols:
+        currency = currency_cache.get(f"CURRENCY_{symbol}") or _infer_currency(symbol)
+        if currency:
+            currencies[symbol] = currency
+        else:
+            lookups.append(symbol)
+
+    if len(lookups) == 1:
+        currency = _get_quote_currency(lookups[0])
+        if currency:
+            currencies[lookups[0]] = currency
+    elif lookups:
+        for symbol, currency in zip(lookups, _currency_executor.map(_get_quote_currency, lookups)):
+            if currency:
+                currencies[symbol] = currency
+    return currencies
+
+
+def _infer_currency(symbol: str) -> str | None:
+    """Currency implied by an exchange suffix, or None (e.g. US symbols carry no suffix)."""
+    for suffix, currency in SUFFIX_CURRENCIES.items():
+        if symbol.endswith(suffix):
+            return currency
+    return None
+
+
+def _get_quote_currency(symbol: str) -> str | None:
+    """
+    Get the trading currency of a Yahoo symbol.
+    Bulk downloads carry no currency, so it is looked up once and cached for a day.
+    """
+    cached_currency = currency_cache.get(f"CURRENCY_{symbol}")
+    if cached_currency:
+        return cached_currency
+
+    try:
+        currency = quote_breaker.call(provider.get_currency, symbol)
+    except Exception:
+        return None
+
+    if currency:
+        currency_cache.set(f"CURRENCY_{symbol}", currency)
+    return currency
 
 
 def build_logo_url(website: str) -> str | None:
@@ -93,29 +754,92 @@ def build_logo_url(website: str) -> str | None:
 def get_stock_profile(ticker: str, region: str = "US") -> dict:
     """
     Fetch stock profile information including website and logo URL.
+    Profiles are shared across users: memory first, then the stock_profiles
+    table, and only then the provider (once per symbol, via single-flight).
     """
+    key = _resolution_key(ticker, region)
 
-    tickers_to_try = normalize_ticker(ticker, region)
+    profile = profile_cache.get(key)
+    if profile is None:
+        profile = _inflight.do(f"PROFILE_{key}", lambda: _load_profile(ticker, region))
 
-    for t in tickers_to_try:
+    website = profile.get("website")
+    return {
+        "symbol": profile.get("symbol") or ticker,
+        "website": website,
+        # Built on read so a changed LOGO_DEV_TOKEN applies to stored profiles
+        "logo_url": build_logo_url(website) if website else None,
+    }
+
+
+def _load_profile(ticker: str, region: str) -> dict:
+    key = _resolution_key(ticker, region)
+
+    cached_profile = profile_cache.peek(key)
+    if cached_profile is not None:
+        return cached_profile
+
+    db = SessionLocal()
+    try:
+        row = StockProfileService.get_profile(db, ticker.upper().strip(), region)
+        if row and (
+            row.website
+            or (datetime.now() - row.fetched_at).total_seconds() < PROFILE_NOT_FOUND_TTL_SECONDS
+        ):
+            profile = {"symbol": row.resolved_symbol, "website": row.website}
+            profile_cache.set(key, profile)
+            return profile
+    except Exception as e:
+        print(f"Failed to read stock profile {key}: {e}")
+    finally:
+        db.close()
+
+    profile, complete = _fetch_profile(ticker, region)
+
+    # Only remember a missing website if the provider actually answered
+    if complete:
+        profile_cache.set(key, profile)
+        db = SessionLocal()
         try:
-            stock = yf.Ticker(t)
+            StockProfileService.save_profile(
+                db, ticker.upper().strip(), region, profile["symbol"], profile["website"]
+            )
+        except Exception as e:
+            db.rollback()
+            print(f"Failed to store stock profile {key}: {e}")
+        finally:
+            db.close()
+
+    return profile
+
 
-            info = stock.get_info()
+def _fetch_profile(ticker: str, region: str) -> tuple[dict, bool]:
+    """
+    Ask the provider for a profile with a website, trying each candidate symbol.
+    Returns:
+        ({"symbol", "website"}, complete): complete is False if every candidate errored.
+    """
+    tickers_to_try = _candidate_symbols(ticker, region)
+    answered = False
+
+    for t in tickers_to_try:
+        try:
+            info = profile_breaker.call(provider.get_profile, t)
+            answered = True
             website = info.get("website")
 
             if not website:
                 continue
 
-            # 解析 domain
-            logo_url = build_logo_url(website)
-
-            return {"symbol": t, "website": website, "logo_url": logo_url}
+            return {"symbol": t, "website": website}, True
 
+        except SymbolNotFoundError:
+            answered = True
+            continue
         except Exception:
             continue
 
-    return {"symbol": ticker, "website": None, "logo_url": None}
+    return {"symbol": None, "website": None}, answered
 
 
 def get_exchange_rate(from_curr: str, to_curr: str) -> float:
@@ -151,21 +875,164 @@ def get_exchange_rate(from_curr: str, to_curr: str) -> float:
         return 1.0
 
     try:
-        usd_to_from = 1.0
-        if from_curr != "USD":
-            usd_to_from = _fetch_yahoo_currency(from_curr)
+        rate = rate_matrix.get_rate(from_curr, to_curr)
+
+        return round(rate, 4)
 
-        usd_to_to = 1.0
-        if to_curr != "USD":
-            usd_to_to = _fetch_yahoo_currency(to_curr)
+    except Exception as e:
+        raise ValueError(f"匯率查詢失敗: {e}")
 
-        rate = usd_to_to / usd_to_from
 
-        return round(rate, 4)
+def get_exchange_rates(base: str) -> tuple[dict[str, float], datetime]:
+    """
+    Rates from every supported currency to `base`, all read from the same
+    rate matrix snapshot.
+    Args:
+        base (str): Target currency code (e.g., 'TWD'). Case-insensitive.
+    Returns:
+        tuple: (currency -> rate to base rounded to 4 decimal places, snapshot time).
+            Currencies whose USD leg is unavailable are left out.
+    Raises:
+        ValueError: If the base currency is not supported or its own leg is unavailable.
+    """
+    base = base.upper()
+    if base not in SUPPORTED_CURRENCIES:
+        raise ValueError(f"不支援的貨幣: {base}")
 
+    try:
+        snapshot = rate_matrix.get_snapshot()
     except Exception as e:
         raise ValueError(f"匯率查詢失敗: {e}")
 
+    column = snapshot.matrix[:, snapshot.index[base]]
+    if not np.isfinite(column).any():
+        raise ValueError(f"Yahoo 查無此匯率: {base}")
+
+    rates = {
+        currency: round(float(rate), 4)
+        for currency, rate in zip(snapshot.currencies, column)
+        if np.isfinite(rate)
+    }
+    rates[base] = 1.0
+    return rates, snapshot.updated_at
+
+
+class RateMatrixSnapshot:
+    """
+    Immutable N x N cross-rate table for SUPPORTED_CURRENCIES.
+    matrix[index[A], index[B]] is the rate A -> B; NaN where a leg is unavailable.
+    """
+
+    def __init__(
+        self, currencies: list[str], usd_rates: np.ndarray, updated_at: datetime, complete: bool = True
+    ):
+        self.currencies = currencies
+        self.index = {c: i for i, c in enumerate(currencies)}
+        # Rate(A -> B) = Rate(USD -> B) / Rate(USD -> A)
+        self.matrix = usd_rates[np.newaxis, :] / usd_rates[:, np.newaxis]
+        self.matrix.setflags(write=False)
+        # False when a leg is missing or only a stale value was available
+        self.complete = complete and bool(np.isfinite(usd_rates).all())
+        self.updated_at = updated_at
+        self._created = time.monotonic()
+
+    def age_seconds(self) -> float:
+        return time.monotonic() - self._created
+
+    def get_rate(self, from_curr: str, to_curr: str) -> float:
+        rate = self.matrix[self.index[from_curr], self.index[to_curr]]
+        if not np.isfinite(rate):
+            raise ValueError(f"Yahoo 查無此匯率: {from_curr}/{to_curr}")
+        return float(rate)
+
+
+class RateMatrix:
+    """
+    Cross-rate matrix for every pair of SUPPORTED_CURRENCIES, built from one
+    batched fetch of the USD -> X legs. Lookups are O(1) array reads, and a
+    refresh swaps in a whole new snapshot so readers never see a half-updated table.
+    Within stale_seconds past its TTL the old snapshot is still served while a
+    rebuild runs in the background, like rate_cache entries.
+    """
+
+    # A matrix with missing legs is retried sooner than a complete one
+    INCOMPLETE_TTL_SECONDS = 30
+
+    def __init__(self, ttl_seconds: int = 300, stale_seconds: int = 0):
+        self.ttl = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.currencies = sorted(SUPPORTED_CURRENCIES)
+        self._snapshot: RateMatrixSnapshot | None = None
+
+    def _ttl(self, snapshot: RateMatrixSnapshot) -> float:
+        return self.ttl if snapshot.complete else min(self.ttl, self.INCOMPLETE_TTL_SECONDS)
+
+    def _is_stale(self, snapshot: RateMatrixSnapshot | None) -> bool:
+        return snapshot is None or snapshot.age_seconds() > self._ttl(snapshot)
+
+    def get_snapshot(self) -> RateMatrixSnapshot:
+        snapshot = self._snapshot
+        if not self._is_stale(snapshot):
+            return snapshot
+        if snapshot is not None and snapshot.age_seconds() <= self._ttl(snapshot) + self.stale_seconds:
+            _refresh_in_background("RATE_MATRIX", self._refresh_if_stale)
+            return snapshot
+        return _inflight.do("RATE_MATRIX", self._refresh_if_stale)
+
+    def get_rate(self, from_curr: str, to_curr: str) -> float:
+        return self.get_snapshot().get_rate(from_curr, to_curr)
+
+    def refresh(self, force: bool = False) -> RateMatrixSnapshot:
+        """
+        Rebuild the matrix. Legs still fresh in rate_cache are reused unless
+        force is True; the rest are downloaded in one bulk request. A leg the
+        download missed keeps its stale cached value when there is one (the
+        snapshot then counts as incomplete and is retried sooner), otherwise
+        it falls back to a single lookup.
+        """
+        legs: dict[str, float] = {"USD": 1.0}
+        stale_legs: dict[str, float] = {}
+        for currency in self.currencies:
+            if currency == "USD":
+                continue
+            entry = rate_cache.get_entry(f"RATE_{fx_symbol(currency)}", allow_stale=True)
+            if entry is None or not entry[0]:
+                continue
+            cached_price, is_fresh = entry
+            if is_fresh and not force:
+                legs[currency] = cached_price
+            else:
+                stale_legs[currency] = cached_price
+
+        missing = [c for c in self.currencies if c not in legs]
+        if missing:
+            legs.update(refresh_exchange_rates(missing))
+
+        complete = True
+        for currency in self.currencies:
+            if currency in legs:
+                continue
+            if currency in stale_legs:
+                legs[currency] = stale_legs[currency]
+                complete = False
+                continue
+            try:
+                legs[currency] = _fetch_yahoo_currency(currency)
+            except Exception:
+                legs[currency] = np.nan
+
+        usd_rates = np.array([legs[c] for c in self.currencies], dtype=float)
+        snapshot = RateMatrixSnapshot(self.currencies, usd_rates, datetime.now(), complete)
+        self._snapshot = snapshot
+        return snapshot
+
+    def _refresh_if_stale(self) -> RateMatrixSnapshot:
+        # Another flight may have refreshed it while we waited
+        snapshot = self._snapshot
+        if not self._is_stale(snapshot):
+            return snapshot
+        return self.refresh()
+
 
 def _fetch_yahoo_currency(currency: str) -> float:
     """
@@ -178,20 +1045,197 @@ def _fetch_yahoo_currency(currency: str) -> float:
         ValueError: If exchange rate not found on Yahoo Finance
 
     """
-    if currency == "RMB":
-        symbol = "CNY=X"
-    else:
-        symbol = f"{currency}=X"
+    symbol = fx_symbol(currency)
+
+    cached_price = _get_cached(rate_cache, f"RATE_{symbol}", lambda: _fetch_rate(symbol))
+    if cached_price:
+        return cached_price
+
+    return _inflight.do(f"RATE_{symbol}", lambda: _fetch_rate(symbol))
 
-    cached_price = rate_cache.get(f"RATE_{symbol}")
+
+def _fetch_rate(symbol: str) -> float:
+    """
+    Fetch a USD cross rate (e.g. 'TWD=X') from the market data provider and store it in rate_cache.
+    Runs under single-flight, so at most one call per symbol is in progress.
+    """
+    cached_price = rate_cache.peek(f"RATE_{symbol}")
     if cached_price:
         return cached_price
 
-    ticker = yf.Ticker(symbol)
-    price = ticker.fast_info.last_price
+    try:
+        price, _ = quote_breaker.call(provider.get_quote, symbol)
+    except CircuitOpenError:
+        # Serve the last stored rate while upstream is degraded (not cached,
+        # so a fresh rate is picked up as soon as the circuit closes)
+        last_known = _last_known_quotes([symbol])
+        if symbol in last_known:
+            return last_known[symbol]["price"]
+        raise
 
     if not price:
         raise ValueError(f"Yahoo 查無此匯率: {symbol}")
 
     rate_cache.set(f"RATE_{symbol}", price)
+    _store_quotes([(symbol, price, symbol.replace("=X", ""))])
     return price
+
+
+def fx_symbol(currency: str) -> str:
+    """Yahoo symbol for the USD -> currency rate, e.g. 'TWD' -> 'TWD=X'."""
+    if currency == "RMB":
+        return "CNY=X"
+    return f"{currency}=X"
+
+
+def refresh_exchange_rates(currencies: list[str]) -> dict[str, float]:
+    """
+    Download USD -> currency rates for all given currencies in one bulk request
+    and store them in rate_cache, regardless of what is cached.
+    Args:
+        currencies: Currency codes (e.g. ['TWD', 'JPY']). USD and unsupported codes are skipped.
+    Returns:
+        dict: Currency code -> USD rate for every currency that was refreshed.
+    """
+    symbols = {
+        c: fx_symbol(c)
+        for c in {c.upper() for c in currencies}
+        if c in SUPPORTED_CURRENCIES and c != "USD"
+    }
+
+    prices = _download_last_prices(list(set(symbols.values()))) or {}
+
+    rates: dict[str, float] = {}
+    fetched = []
+    for currency, symbol in symbols.items():
+        price = prices.get(symbol)
+        if not price:
+            continue
+        rate_cache.set(f"RATE_{symbol}", price)
+        rates[currency] = price
+        fetched.append((symbol, price, symbol.replace("=X", "")))
+
+    _store_quotes(list(dict.fromkeys(fetched)))
+    return rates
+
+
+rate_matrix = RateMatrix(ttl_seconds=rate_cache.ttl, stale_seconds=rate_cache.stale_seconds)
+
+
+def resolve_symbols(tickers: list[str], region_map: dict[str, str] | None = None) -> dict[str, str]:
+    """
+    Map user-entered tickers to provider symbols (e.g. '8069' -> '8069.TWO'),
+    using remembered resolutions and one bulk quote lookup for the rest.
+    Returns:
+        dict: Ticker -> symbol. Tickers that cannot be resolved are left out.
+    """
+    region_map = region_map or {}
+    resolved: dict[str, str] = {}
+    unresolved = []
+
+    for ticker in dict.fromkeys(tickers):
+        symbol = resolution_cache.get(_resolution_key(ticker, region_map.get(ticker, "US")))
+        if symbol:
+            resolved[ticker] = symbol
+        else:
+            unresolved.append(ticker)
+
+    if unresolved:
+        quotes = get_stock_data_many(unresolved, region_map)
+        resolved.update({ticker: quote["symbol"] for ticker, quote in quotes.items()})
+
+    return resolved
+
+
+def get_price_history(
+    symbols: list[str], start: date, end: date
+) -> dict[str, tuple[list[date], list[float]]]:
+    """
+    Daily closes per provider symbol (e.g. 'AAPL', 'TWD=X') from the
+    price_history table, after downloading any missing date ranges.
+    Returns:
+        dict: Symbol -> (dates, closes), parallel lists in date order.
+    """
+    _sync_price_history(symbols, start, end)
+
+    db = SessionLocal()
+    try:
+        return PriceHistoryService.get_series(db, symbols, start, end)
+    finally:
+        db.close()
+
+
+def _sync_price_history(symbols: list[str], start: date, end: date) -> None:
+    """
+    Download closes for the parts of start..end never requested for each
+    symbol, including holes between earlier requests. Symbols missing the same
+    range share one bulk request. A range is recorded per symbol once the
+    provider answered for it, even without closes (holidays, before listing),
+    so it is not downloaded again; symbols it dropped are retried next time.
+    """
+    # A close is only final once its day is over
+    end = min(end, date.today() - timedelta(days=1))
+    if start > end or not symbols:
+        return
+
+    db = SessionLocal()
+    try:
+        fetched = PriceHistoryService.get_fetched_ranges(db, symbols)
+    finally:
+        db.close()
+
+    gaps: dict[tuple[date, date], list[str]] = {}
+    for symbol in dict.fromkeys(symbols):
+        for range_start, range_end in _missing_ranges(start, end, fetched.get(symbol, [])):
+            # Weekend-only gaps have nothing to fetch
+            if _has_weekday(range_start, range_end):
+                gaps.setdefault((range_start, range_end), []).append(symbol)
+
+    for (range_start, range_end), gap_symbols in gaps.items():
+        try:
+            closes = history_breaker.call(provider.get_daily_closes, gap_symbols, range_start, range_end)
+        except Exception as e:
+            print(f"Failed to download price history {range_start}..{range_end}: {e}")
+            continue
+
+        db = SessionLocal()
+        try:
+            PriceHistoryService.save_closes(db, closes)
+            # Symbols the provider did not answer for stay unfetched and are retried
+            answered = [symbol for symbol in gap_symbols if symbol in closes]
+            PriceHistoryService.mark_fetched(db, answered, range_start, range_end)
+        except Exception as e:
+            db.rollback()
+            print(f"Failed to store price history: {e}")
+        finally:
+            db.close()
+
+
+def _missing_ranges(
+    start: date, end: date, fetched: list[tuple[date, date]]
+) -> list[tuple[date, date]]:
+    """
+    Parts of start..end not covered by the sorted, non-overlapping fetched ranges.
+    """
+    one_day = timedelta(days=1)
+    missing = []
+    cursor = start
+    for first, last in fetched:
+        if last < cursor:
+            continue
+        if first > end:
+            break
+        if first > cursor:
+            missing.append((cursor, first - one_day))
+        cursor = last + one_day
+        if cursor > end:
+            return missing
+    missing.append((cursor, end))
+    return missing
+
+
+def _has_weekday(start: date, end: date) -> bool:
+    # Any three consecutive days include a weekday
+    if (end - start).days >= 2:
+        return True
+    return any((start + timedelta(days=i)).weekday() < 5 for i in range((end - start).days + 1))
@@ -0,0 +1,167 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Coroutine, Optional
+
+from src.services import market
+
+# Upper bound on concurrent upstream calls, shared by every caller of the client
+MARKET_MAX_CONCURRENCY = int(os.getenv("MARKET_MAX_CONCURRENCY", "8"))
+# Hard limit for a single quote / profile / FX lookup
+MARKET_CALL_TIMEOUT_SECONDS = float(os.getenv("MARKET_CALL_TIMEOUT_SECONDS", "10"))
+# Extra budget per ticker for a bulk quote download, on top of the single-call limit
+MARKET_BULK_TIMEOUT_PER_TICKER_SECONDS = float(os.getenv("MARKET_BULK_TIMEOUT_PER_TICKER_SECONDS", "0.05"))
+
+
+class MarketTimeoutError(Exception):
+    """A market lookup did not finish within its time budget."""
+
+
+class MarketBusyError(MarketTimeoutError):
+    """Every market worker is stuck in a call that already timed out; rejected without queueing."""
+
+
+class AsyncMarketClient:
+    """
+    Asyncio front end for services/market.py.
+
+    Blocking lookups run on a dedicated, bounded thread pool instead of the
+    threadpool that serves FastAPI's sync endpoints, so stalled upstream calls
+    cannot starve the API. Every call has a hard timeout, and fan-out helpers
+    bound their concurrency with a semaphore.
+
+    A timeout only stops the wait: a running provider call keeps its worker
+    until the provider's own HTTP timeout ends it (see YAHOO_HTTP_TIMEOUT_SECONDS).
+    Such abandoned calls are counted, and while they hold every worker new
+    calls fail fast with MarketBusyError instead of queueing into a timeout.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = MARKET_MAX_CONCURRENCY,
+        timeout_seconds: float = MARKET_CALL_TIMEOUT_SECONDS,
+    ):
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="market-io"
+        )
+        self._lock = threading.Lock()
+        # Calls still running on a worker after their caller timed out
+        self._abandoned = 0
+
+    async def _call(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        with self._lock:
+            if self._abandoned >= self.max_concurrency:
+                raise MarketBusyError(
+                    f"{fn.__name__}{args} rejected: all {self.max_concurrency} market workers are stalled"
+                )
+
+        state = {"started": False, "done": False, "abandoned": False}
+
+        def run() -> Any:
+            with self._lock:
+                state["started"] = True
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    state["done"] = True
+                    if state["abandoned"]:
+                        self._abandoned -= 1
+
+        loop = asyncio.get_running_loop()
+        # A call that times out while still queued is cancelled before it starts
+        future = loop.run_in_executor(self._executor, run)
+        try:
+            return await asyncio.wait_for(future, timeout or self.timeout_seconds)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if state["started"] and not state["done"]:
+                    state["abandoned"] = True
+                    self._abandoned += 1
+            raise MarketTimeoutError(f"{fn.__name__}{args} timed out")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"max_concurrency": self.max_concurrency, "abandoned_calls": self._abandoned}
+
+    async def get_stock_data(self, ticker: str, region: str = "US") -> dict:
+        return await self._call(market.get_stock_data, ticker, region)
+
+    async def get_stock_profile(self, ticker: str, region: str = "US") -> dict:
+        return await self._call(market.get_stock_profile, ticker, region)
+
+    async def get_exchange_rate(self, from_curr: str, to_curr: str) -> float:
+        return await self._call(market.get_exchange_rate, from_curr, to_curr)
+
+    async def get_exchange_rates(self, base: str) -> tuple[dict[str, float], datetime]:
+        return await self._call(market.get_exchange_rates, base)
+
+    async def gather(
+        self, calls: dict[str, Coroutine[Any, Any, Any]], limit: Optional[int] = None
+    ) -> dict[str, Any]:
+        """
+        Await many lookups concurrently, at most `limit` at a time.
+        Returns:
+            dict: Key -> result for every call that succeeded; failed and
+                timed-out calls are left out.
+        """
+        semaphore = asyncio.Semaphore(limit or self.max_concurrency)
+
+        async def run(key: str, coro: Coroutine[Any, Any, Any]):
+            async with semaphore:
+                try:
+                    return key, await coro
+                except Exception:
+                    return key, None
+
+        results = await asyncio.gather(*(run(k, c) for k, c in calls.items()))
+        return {key: value for key, value in results if value is not None}
+
+    async def get_stock_data_many(
+        self, tickers: list[str], region_map: Optional[dict[str, str]] = None
+    ) -> dict[str, dict]:
+        """
+        One bulk download for all tickers, with a time budget that grows with
+        the batch, then concurrent single lookups for whatever it did not return.
+        If the bulk call itself fails or times out, upstream is struggling (and
+        the call may still hold a worker), so only cached and last stored
+        quotes are returned instead of fanning out one request per ticker.
+        """
+        region_map = region_map or {}
+        timeout = self.timeout_seconds + MARKET_BULK_TIMEOUT_PER_TICKER_SECONDS * len(tickers)
+        try:
+            results = await self._call(market.get_stock_data_many, tickers, region_map, timeout=timeout)
+        except Exception as e:
+            print(f"Bulk quote lookup for {len(tickers)} tickers failed, serving cached quotes: {e}")
+            # Off the market pool, which may be the thing that is stalled
+            return await asyncio.to_thread(market.get_cached_stock_data_many, tickers, region_map)
+
+        missing = [t for t in dict.fromkeys(tickers) if t not in results]
+        if missing:
+            results.update(
+                await self.gather(
+                    {t: self.get_stock_data(t, region_map.get(t, "US")) for t in missing}
+                )
+            )
+        return results
+
+    @staticmethod
+    def run(coro: Coroutine[Any, Any, Any]) -> Any:
+        """
+        Run a client coroutine from synchronous code (e.g. SnapshotService).
+        Only for sync callers: inside a running event loop, await the
+        coroutine instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+        coro.close()
+        raise RuntimeError("market_client.run() called from a running event loop; await the coroutine instead")
+
+
+market_client = AsyncMarketClient()
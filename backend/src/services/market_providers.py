@@ -0,0 +1,434 @@
+import hashlib
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Optional
+
+import yfinance as yf
+from yfinance.data import new_session
+from yfinance.exceptions import YFPricesMissingError, YFRateLimitError
+
+# "yahoo" (default) or "fixture" for offline benchmarks and load tests
+MARKET_DATA_PROVIDER = os.getenv("MARKET_DATA_PROVIDER", "yahoo").lower()
+MARKET_FIXTURE_PATH = os.getenv("MARKET_FIXTURE_PATH")
+MARKET_FIXTURE_SEED = os.getenv("MARKET_FIXTURE_SEED", "finance-dashboard")
+# Socket timeout for every Yahoo HTTP request. Keep it below
+# MARKET_CALL_TIMEOUT_SECONDS so a stalled call frees its worker soon after
+# the caller gives up on it.
+YAHOO_HTTP_TIMEOUT_SECONDS = float(os.getenv("YAHOO_HTTP_TIMEOUT_SECONDS", "8"))
+# Parallel single-symbol requests for tickers a bulk history download dropped
+YAHOO_HISTORY_RETRY_WORKERS = 8
+# Artificial per-call latency for the fixture provider, to mimic a remote API
+MARKET_FIXTURE_LATENCY_MS = int(os.getenv("MARKET_FIXTURE_LATENCY_MS", "0"))
+
+
+class SymbolNotFoundError(Exception):
+    """The provider answered, but has no data for the symbol (not an upstream failure)."""
+
+
+class MarketDataProvider(ABC):
+    """
+    Source of raw market data. Symbols are already normalized Yahoo-style
+    symbols (e.g. '2330.TW', 'AAPL', 'TWD=X'); caching and fallbacks live in
+    services/market.py.
+
+    Single-symbol lookups raise SymbolNotFoundError when the provider answered
+    but does not know the symbol; any other exception means the provider
+    itself failed (network, timeout, rate limit).
+    """
+
+    name: str
+
+    @abstractmethod
+    def get_quote(self, symbol: str) -> tuple[Optional[float], Optional[str]]:
+        """Latest (price, currency) for one symbol; either may be None if unknown."""
+
+    @abstractmethod
+    def get_last_prices(self, symbols: list[str]) -> dict[str, float]:
+        """Latest price per symbol in one request. Symbols without data are left out."""
+
+    @abstractmethod
+    def get_currency(self, symbol: str) -> Optional[str]:
+        """Trading currency of a symbol."""
+
+    @abstractmethod
+    def get_profile(self, symbol: str) -> dict:
+        """Company profile (at least 'website' when known)."""
+
+    @abstractmethod
+    def get_daily_closes(
+        self, symbols: list[str], start: date, end: date
+    ) -> dict[str, dict[date, float]]:
+        """
+        Daily closes per symbol for start..end (inclusive), in one request.
+        A symbol the provider confirmed has no closes in the range (holidays,
+        before listing, delisted) maps to an empty dict; symbols it did not
+        answer for are left out, so callers can retry them.
+        """
+
+
+class YahooFinanceProvider(MarketDataProvider):
+    name = "yahoo"
+
+    def __init__(self, timeout_seconds: float = YAHOO_HTTP_TIMEOUT_SECONDS):
+        self.timeout_seconds = timeout_seconds
+        self._session = _timeout_session(timeout_seconds)
+
+    def _ticker(self, symbol: str) -> yf.Ticker:
+        return yf.Ticker(symbol, session=self._session)
+
+    def get_quote(self, symbol: str) -> tuple[Optional[float], Optional[str]]:
+        try:
+            stock = self._ticker(symbol)
+            return stock.fast_info.last_price, stock.fast_info.currency
+        except Exception as e:
+            raise self._classify_error(symbol, e)
+
+    def get_last_prices(self, symbols: list[str]) -> dict[str, float]:
+        if not symbols:
+            return {}
+
+        # Per-ticker failures are swallowed by yf.download; anything it raises
+        # is a failure of the request as a whole
+        data = yf.download(
+            symbols,
+            period="5d",
+            interval="1d",
+            group_by="ticker",
+            auto_adjust=False,
+            progress=False,
+            threads=True,
+            timeout=self.timeout_seconds,
+            session=self._session,
+        )
+
+        if data is None or data.empty:
+            return {}
+
+        # Columns are (symbol, field) when grouped by ticker; older yfinance
+        # versions flatten them when only one symbol is requested.
+        is_grouped = data.columns.nlevels > 1
+
+        prices: dict[str, float] = {}
+        for t in symbols:
+            try:
+                closes = data[t]["Close"] if is_grouped else data["Close"]
+                closes = closes.dropna()
+                if not closes.empty:
+                    prices[t] = float(closes.iloc[-1])
+            except Exception:
+                continue
+
+        return prices
+
+    def get_currency(self, symbol: str) -> Optional[str]:
+        try:
+            return self._ticker(symbol).fast_info.currency
+        except Exception as e:
+            raise self._classify_error(symbol, e)
+
+    def get_profile(self, symbol: str) -> dict:
+        try:
+            return self._ticker(symbol).get_info()
+        except Exception as e:
+            raise self._classify_error(symbol, e)
+
+    def _classify_error(self, symbol: str, e: Exception) -> Exception:
+        """
+        SymbolNotFoundError only when Yahoo explicitly answers that it has no
+        data for the symbol. Transport errors and anything else (malformed or
+        partial payloads, parse errors) pass through unchanged, so they count
+        against the circuit breaker and are not cached as unknown symbols.
+        """
+        if isinstance(e, YFPricesMissingError):
+            explicit = e.yahoo_reason is not None
+        elif _is_transport_error(e):
+            return e
+        else:
+            # yfinance reports an unknown symbol as a KeyError on missing
+            # metadata, same as a malformed answer; ask the chart API directly
+            explicit = self._is_unknown_symbol(symbol)
+        if not explicit:
+            return e
+        not_found = SymbolNotFoundError(f"{symbol}: {e}")
+        not_found.__cause__ = e
+        return not_found
+
+    def _is_unknown_symbol(self, symbol: str) -> bool:
+        """Whether Yahoo's chart API answers with an explicit "no data" error for symbol."""
+        try:
+            self._ticker(symbol).history(
+                period="5d", interval="1d", auto_adjust=False, timeout=self.timeout_seconds, raise_errors=True
+            )
+        except YFPricesMissingError as e:
+            return e.yahoo_reason is not None
+        except Exception:
+            return False
+        return False
+
+    def get_daily_closes(
+        self, symbols: list[str], start: date, end: date
+    ) -> dict[str, dict[date, float]]:
+        if not symbols:
+            return {}
+
+        data = yf.download(
+            symbols,
+            start=start.isoformat(),
+            # yfinance treats `end` as exclusive
+            end=(end + timedelta(days=1)).isoformat(),
+            interval="1d",
+            group_by="ticker",
+            auto_adjust=False,
+            progress=False,
+            threads=True,
+            timeout=self.timeout_seconds,
+            session=self._session,
+        )
+
+        closes: dict[str, dict[date, float]] = {}
+        if data is not None and not data.empty:
+            is_grouped = data.columns.nlevels > 1
+            for t in symbols:
+                try:
+                    series = (data[t]["Close"] if is_grouped else data["Close"]).dropna()
+                except Exception:
+                    continue
+                if not series.empty:
+                    closes[t] = {ts.date(): float(v) for ts, v in series.items()}
+
+        # The threaded download silently drops tickers that failed; ask for
+        # those one by one to tell "no data in range" from "no answer"
+        missing = [t for t in symbols if t not in closes]
+        if not missing:
+            return closes
+
+        # Probe one first: if Yahoo does not answer it either, it is down and
+        # the rest would only pile up timeouts
+        series = self._get_closes(missing[0], start, end)
+        if series is None:
+            return closes
+        closes[missing[0]] = series
+
+        rest = missing[1:]
+        if rest:
+            with ThreadPoolExecutor(max_workers=min(len(rest), YAHOO_HISTORY_RETRY_WORKERS)) as pool:
+                for t, series in zip(rest, pool.map(lambda t: self._get_closes(t, start, end), rest)):
+                    if series is not None:
+                        closes[t] = series
+
+        return closes
+
+    def _get_closes(self, symbol: str, start: date, end: date) -> Optional[dict[date, float]]:
+        """
+        Daily closes of one symbol, {} when Yahoo answered without any in the
+        range, or None when it did not answer (the range is retried later).
+        """
+        ticker = self._ticker(symbol)
+        try:
+            data = ticker.history(
+                start=start.isoformat(),
+                end=(end + timedelta(days=1)).isoformat(),
+                interval="1d",
+                auto_adjust=False,
+                timeout=self.timeout_seconds,
+                raise_errors=True,
+            )
+        except YFPricesMissingError as e:
+            # Yahoo either explained the absence (e.g. delisted) or sent the
+            # symbol's chart metadata with no rows (holidays, before listing)
+            if e.yahoo_reason is not None:
+                return {}
+            try:
+                return {} if ticker.get_history_metadata().get("symbol") else None
+            except Exception:
+                return None
+        except Exception:
+            return None
+
+        series = data["Close"].dropna() if data is not None and not data.empty else None
+        if series is None or series.empty:
+            return None
+        return {ts.date(): float(v) for ts, v in series.items()}
+
+
+def _is_transport_error(e: Exception) -> bool:
+    """Whether an exception means Yahoo could not be reached or refused to answer."""
+    if isinstance(e, (YFRateLimitError, ConnectionError, TimeoutError, OSError)):
+        return True
+    # HTTP client errors (curl_cffi, requests, urllib3) do not share a base class
+    return type(e).__module__.split(".")[0] in {"curl_cffi", "requests", "urllib3"}
+
+
+def _timeout_session(timeout_seconds: float):
+    """
+    yfinance's own HTTP session with every request's timeout capped at
+    timeout_seconds (Ticker lookups otherwise use a fixed 30s).
+    """
+    session = new_session()
+    request = session.request
+
+    def request_with_timeout(*args, **kwargs):
+        timeout = kwargs.get("timeout")
+        kwargs["timeout"] = timeout_seconds if timeout is None else min(timeout, timeout_seconds)
+        return request(*args, **kwargs)
+
+    session.request = request_with_timeout
+    return session
+
+
+class FixtureProvider(MarketDataProvider):
+    """
+    Deterministic offline provider.
+
+    With MARKET_FIXTURE_PATH set, serves only the symbols in that JSON file:
+        {
+          "quotes": {"AAPL": {"price": 190.5, "currency": "USD"}},
+          "fx": {"TWD": 32.1, "JPY": 150.2},          # USD -> X
+          "profiles": {"AAPL": {"website": "https://www.apple.com"}},
+          "history": {"AAPL": {"2024-01-02": 185.6}}   # optional daily closes
+        }
+    Without a file, every symbol gets a stable price derived from
+    MARKET_FIXTURE_SEED, so repeated runs see identical data. Daily closes
+    are the current price with a stable per-day jitter unless given in "history".
+    """
+
+    name = "fixture"
+
+    # Rough USD -> X levels for generated FX legs
+    _BASE_FX = {
+        "TWD": 32.0,
+        "JPY": 150.0,
+        "SGD": 1.35,
+        "KRW": 1350.0,
+        "CNY": 7.2,
+        "EUR": 0.92,
+        "GBP": 0.79,
+        "AUD": 1.52,
+        "CAD": 1.37,
+    }
+
+    def __init__(self, path: Optional[str] = None, seed: str = "", latency_ms: int = 0):
+        self.seed = seed
+        self.latency_ms = latency_ms
+        self.fixture: Optional[dict] = None
+        if path:
+            with open(path, encoding="utf-8") as f:
+                self.fixture = json.load(f)
+
+    def _sleep(self):
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000)
+
+    def _unit(self, symbol: str) -> float:
+        """Stable pseudo-random number in [0, 1) for a symbol."""
+        digest = hashlib.sha256(f"{self.seed}:{symbol}".encode()).digest()
+        return int.from_bytes(digest[:8], "big") / 2**64
+
+    @staticmethod
+    def _infer_currency(symbol: str) -> str:
+        if symbol.endswith("=X"):
+            return symbol[:-2]
+        if symbol.endswith(".TW") or symbol.endswith(".TWO"):
+            return "TWD"
+        if symbol.endswith(".T"):
+            return "JPY"
+        return "USD"
+
+    def _lookup(self, symbol: str) -> tuple[Optional[float], Optional[str]]:
+        if self.fixture is not None:
+            if symbol.endswith("=X"):
+                price = self.fixture.get("fx", {}).get(symbol[:-2])
+                return price, (symbol[:-2] if price else None)
+            quote = self.fixture.get("quotes", {}).get(symbol)
+            if not quote:
+                return None, None
+            return quote.get("price"), quote.get("currency") or self._infer_currency(symbol)
+
+        if symbol.endswith("=X"):
+            base = self._BASE_FX.get(symbol[:-2])
+            if base is None:
+                return None, None
+            # Within +/-2% of the base level
+            return round(base * (0.98 + 0.04 * self._unit(symbol)), 4), symbol[:-2]
+
+        currency = self._infer_currency(symbol)
+        scale = {"TWD": 1000, "JPY": 5000}.get(currency, 500)
+        return round(5 + scale * self._unit(symbol), 2), currency
+
+    def get_quote(self, symbol: str) -> tuple[Optional[float], Optional[str]]:
+        self._sleep()
+        return self._lookup(symbol)
+
+    def get_last_prices(self, symbols: list[str]) -> dict[str, float]:
+        if not symbols:
+            return {}
+        self._sleep()
+        prices = {}
+        for symbol in symbols:
+            price, _ = self._lookup(symbol)
+            if price:
+                prices[symbol] = price
+        return prices
+
+    def get_currency(self, symbol: str) -> Optional[str]:
+        self._sleep()
+        return self._lookup(symbol)[1]
+
+    def get_profile(self, symbol: str) -> dict:
+        self._sleep()
+        if self.fixture is not None:
+            return self.fixture.get("profiles", {}).get(symbol, {})
+        return {}
+
+    def get_daily_closes(
+        self, symbols: list[str], start: date, end: date
+    ) -> dict[str, dict[date, float]]:
+        if not symbols:
+            return {}
+        self._sleep()
+
+        closes: dict[str, dict[date, float]] = {}
+        for symbol in symbols:
+            fixed = (self.fixture or {}).get("history", {}).get(symbol)
+            if fixed is not None:
+                series = {
+                    date.fromisoformat(d): float(v)
+                    for d, v in fixed.items()
+                    if start <= date.fromisoformat(d) <= end
+                }
+            else:
+                price, _ = self._lookup(symbol)
+                if not price:
+                    continue
+                series = {}
+                day = start
+                while day <= end:
+                    if day.weekday() < 5:
+                        # Within +/-5% of the current price, stable per day
+                        jitter = 0.95 + 0.1 * self._unit(f"{symbol}:{day.isoformat()}")
+                        series[day] = round(price * jitter, 4)
+                    day += timedelta(days=1)
+            closes[symbol] = series
+
+        return closes
+
+
+def get_market_data_provider() -> MarketDataProvider:
+    """
+    Build the provider selected by MARKET_DATA_PROVIDER.
+    Raises:
+        ValueError: If the provider name is unknown.
+    """
+    if MARKET_DATA_PROVIDER == "yahoo":
+        return YahooFinanceProvider()
+    if MARKET_DATA_PROVIDER == "fixture":
+        return FixtureProvider(
+            path=MARKET_FIXTURE_PATH,
+            seed=MARKET_FIXTURE_SEED,
+            latency_ms=MARKET_FIXTURE_LATENCY_MS,
+        )
+    raise ValueError(f"Unknown MARKET_DATA_PROVIDER: {MARKET_DATA_PROVIDER}")
@@ -0,0 +1,178 @@
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import IO, Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, every process prefetches
+    fcntl = None
+
+from sqlalchemy.orm import Session
+from src import models
+from src.database import SessionLocal
+from src.services import market
+
+# How often held symbols are refreshed. Keep it just under the stock_cache TTL
+# so user requests keep hitting warm entries. 0 disables the prefetcher.
+MARKET_PREFETCH_INTERVAL_SECONDS = int(os.getenv("MARKET_PREFETCH_INTERVAL_SECONDS", "55"))
+# Set to false on instances that should never prefetch (e.g. all but one host)
+MARKET_PREFETCH_ENABLED = os.getenv("MARKET_PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+# Workers on one host elect a single prefetcher by holding an exclusive lock on this file
+MARKET_PREFETCH_LOCK_PATH = os.getenv(
+    "MARKET_PREFETCH_LOCK_PATH", os.path.join(tempfile.gettempdir(), "wealth-manager-market-prefetch.lock")
+)
+
+MARKET_ASSET_TYPES = [
+    models.AssetType.STOCK,
+    models.AssetType.CRYPTO,
+    models.AssetType.GOLD,
+]
+
+
+class MarketPrefetcher:
+    """
+    Periodically bulk-refreshes quotes for every held symbol and the FX
+    rate matrix, keeping stock_cache, rate_cache and rate_matrix hot so user
+    requests and SnapshotService rarely call Yahoo inline.
+
+    Only the worker holding the lock file prefetches; the others retry the lock
+    every interval and take over when the leader exits.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: int = MARKET_PREFETCH_INTERVAL_SECONDS,
+        lock_path: str = MARKET_PREFETCH_LOCK_PATH,
+    ):
+        self.interval_seconds = interval_seconds if MARKET_PREFETCH_ENABLED else 0
+        self.lock_path = lock_path
+        self._lock_file: Optional[IO] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.runs = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_duration_seconds: Optional[float] = None
+        self.last_symbol_count = 0
+        self.last_currency_count = 0
+        self.last_error: Optional[str] = None
+
+    @staticmethod
+    def get_held_symbols(db: Session) -> Dict[str, str]:
+        """
+        Distinct (symbol, region) pairs across ACTIVE market assets.
+        Returns:
+            dict: Normalized ticker (e.g. '2330.TW') -> region, so the same raw
+                symbol held under different regions stays distinct.
+        """
+        rows = (
+            db.query(models.Asset.symbol, models.Asset.meta_data)
+            .filter(
+                models.Asset.status == models.AssetStatus.ACTIVE,
+                models.Asset.asset_type.in_(MARKET_ASSET_TYPES),
+                models.Asset.symbol.isnot(None),
+            )
+            .all()
+        )
+
+        region_map: Dict[str, str] = {}
+        for symbol, meta_data in rows:
+            region = meta_data.get("region", "US") if meta_data else "US"
+            region_map[market.normalize_ticker(symbol, region)[0]] = region
+        return region_map
+
+    def run_once(self) -> None:
+        started = time.monotonic()
+        self.last_run_at = datetime.now()
+
+        db = SessionLocal()
+        try:
+            region_map = self.get_held_symbols(db)
+        except Exception as e:
+            self.last_error = f"Failed to load held symbols: {e}"
+            print(f"Market prefetch failed: {e}")
+            return
+        finally:
+            db.close()
+
+        try:
+            if region_map:
+                market.get_stock_data_many(list(region_map), region_map, force_refresh=True)
+            # All FX legs come in one bulk call and rebuild the cross-rate matrix
+            snapshot = market.rate_matrix.refresh(force=True)
+            self.last_currency_count = len(snapshot.currencies)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Market prefetch failed: {e}")
+        finally:
+            self.runs += 1
+            self.last_symbol_count = len(region_map)
+            self.last_duration_seconds = round(time.monotonic() - started, 3)
+
+    def _acquire_leadership(self) -> bool:
+        """Take the prefetch lock if no other process holds it; True while this process holds it."""
+        if self._lock_file:
+            return True
+        if fcntl is None:
+            return True
+
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        print(f"Market prefetcher elected leader (pid {os.getpid()}).")
+        return True
+
+    def _release_leadership(self) -> None:
+        if self._lock_file:
+            # Closing the file drops the flock
+            self._lock_file.close()
+            self._lock_file = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_file is not None or (fcntl is None and self.interval_seconds > 0)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            if self._acquire_leadership():
+                self.run_once()
+            self._stop.wait(self.interval_seconds)
+
+    def start(self) -> None:
+        if self.interval_seconds <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="market-prefetch", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._release_leadership()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.interval_seconds > 0,
+            "running": bool(self._thread and self._thread.is_alive()),
+            "leader": self.is_leader,
+            "interval_seconds": self.interval_seconds,
+            "runs": self.runs,
+            "last_run_at": self.last_run_at,
+            "last_duration_seconds": self.last_duration_seconds,
+            "last_symbol_count": self.last_symbol_count,
+            "last_currency_count": self.last_currency_count,
+            "last_error": self.last_error,
+        }
+
+
+prefetcher = MarketPrefetcher()
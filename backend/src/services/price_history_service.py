@@ -0,0 +1,131 @@
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy.orm import Session
+from src import models
+
+
+class PriceHistoryService:
+
+    @staticmethod
+    def get_fetched_ranges(db: Session, symbols: Iterable[str]) -> Dict[str, List[Tuple[date, date]]]:
+        """
+        Date ranges already requested from the provider per symbol, in date
+        order. Symbols never fetched are left out.
+        """
+        symbols = list(set(symbols))
+        if not symbols:
+            return {}
+
+        rows = (
+            db.query(
+                models.PriceHistoryRange.symbol,
+                models.PriceHistoryRange.start_date,
+                models.PriceHistoryRange.end_date,
+            )
+            .filter(models.PriceHistoryRange.symbol.in_(symbols))
+            .order_by(models.PriceHistoryRange.symbol, models.PriceHistoryRange.start_date)
+            .all()
+        )
+        ranges: Dict[str, List[Tuple[date, date]]] = {}
+        for symbol, start, end in rows:
+            ranges.setdefault(symbol, []).append((start, end))
+        return ranges
+
+    @staticmethod
+    def mark_fetched(db: Session, symbols: Iterable[str], start: date, end: date) -> None:
+        """
+        Record start..end as requested for each symbol, merging it with the
+        ranges it overlaps or touches.
+        """
+        symbols = list(set(symbols))
+        if not symbols:
+            return
+
+        one_day = timedelta(days=1)
+        rows = (
+            db.query(models.PriceHistoryRange)
+            .filter(
+                models.PriceHistoryRange.symbol.in_(symbols),
+                models.PriceHistoryRange.start_date <= end + one_day,
+                models.PriceHistoryRange.end_date >= start - one_day,
+            )
+            .all()
+        )
+        merged = {symbol: (start, end) for symbol in symbols}
+        for row in rows:
+            first, last = merged[row.symbol]
+            merged[row.symbol] = (min(first, row.start_date), max(last, row.end_date))
+            db.delete(row)
+
+        db.add_all(
+            models.PriceHistoryRange(symbol=symbol, start_date=first, end_date=last)
+            for symbol, (first, last) in merged.items()
+        )
+        db.commit()
+
+    @staticmethod
+    def save_closes(db: Session, closes: Dict[str, Dict[date, float]]) -> int:
+        """
+        Insert daily closes that are not stored yet.
+        Returns:
+            int: Number of rows inserted.
+        """
+        closes = {symbol: series for symbol, series in closes.items() if series}
+        if not closes:
+            return 0
+
+        all_dates = [d for series in closes.values() for d in series]
+        existing = set(
+            db.query(models.PriceHistory.symbol, models.PriceHistory.price_date)
+            .filter(
+                models.PriceHistory.symbol.in_(list(closes)),
+                models.PriceHistory.price_date >= min(all_dates),
+                models.PriceHistory.price_date <= max(all_dates),
+            )
+            .all()
+        )
+
+        rows = [
+            {"symbol": symbol, "price_date": d, "close": close}
+            for symbol, series in closes.items()
+            for d, close in series.items()
+            if (symbol, d) not in existing
+        ]
+        if rows:
+            db.bulk_insert_mappings(models.PriceHistory, rows)
+        db.commit()
+        return len(rows)
+
+    @staticmethod
+    def get_series(
+        db: Session, symbols: Iterable[str], start: date, end: date
+    ) -> Dict[str, Tuple[List[date], List[float]]]:
+        """
+        Stored daily closes per symbol between start and end, as parallel
+        (dates, closes) lists in date order.
+        """
+        symbols = list(set(symbols))
+        series: Dict[str, Tuple[List[date], List[float]]] = {s: ([], []) for s in symbols}
+        if not symbols:
+            return series
+
+        rows = (
+            db.query(
+                models.PriceHistory.symbol,
+                models.PriceHistory.price_date,
+                models.PriceHistory.close,
+            )
+            .filter(
+                models.PriceHistory.symbol.in_(symbols),
+                models.PriceHistory.price_date >= start,
+                models.PriceHistory.price_date <= end,
+            )
+            .order_by(models.PriceHistory.symbol, models.PriceHistory.price_date)
+            .all()
+        )
+        for symbol, d, close in rows:
+            dates, closes = series[symbol]
+            dates.append(d)
+            closes.append(close)
+        return series
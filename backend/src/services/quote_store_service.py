@@ -0,0 +1,200 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from src import models
+
+
+class QuoteStoreService:
+
+    @staticmethod
+    def save_quotes(db: Session, quotes: Iterable[Tuple[str, float, str]]) -> None:
+        """
+        Upsert the latest quote of today for each (symbol, price, currency).
+        One row per symbol per day is kept, so older days remain as history.
+        """
+        now = datetime.now()
+        today = now.date()
+
+        latest: Dict[str, Tuple[float, str]] = {
+            symbol: (price, currency) for symbol, price, currency in quotes
+        }
+        if not latest:
+            return
+
+        existing = {
+            row.symbol: row
+            for row in db.query(models.PriceQuote).filter(
+                models.PriceQuote.symbol.in_(list(latest)),
+                models.PriceQuote.quote_date == today,
+            )
+        }
+
+        for symbol, (price, currency) in latest.items():
+            row = existing.get(symbol)
+            if row:
+                row.price = price
+                row.currency = currency
+                row.fetched_at = now
+            else:
+                db.add(
+                    models.PriceQuote(
+                        symbol=symbol,
+                        quote_date=today,
+                        price=price,
+                        currency=currency,
+                        fetched_at=now,
+                    )
+                )
+
+        db.commit()
+
+    @staticmethod
+    def get_latest_quotes(db: Session, symbols: Iterable[str]) -> Dict[str, models.PriceQuote]:
+        """
+        Most recent stored quote for each symbol, however old.
+        """
+        symbols = list(set(symbols))
+        if not symbols:
+            return {}
+
+        latest_per_symbol = (
+            db.query(
+                models.PriceQuote.symbol,
+                func.max(models.PriceQuote.quote_date).label("quote_date"),
+            )
+            .filter(models.PriceQuote.symbol.in_(symbols))
+            .group_by(models.PriceQuote.symbol)
+            .subquery()
+        )
+
+        rows = (
+            db.query(models.PriceQuote)
+            .join(
+                latest_per_symbol,
+                (models.PriceQuote.symbol == latest_per_symbol.c.symbol)
+                & (models.PriceQuote.quote_date == latest_per_symbol.c.quote_date),
+            )
+            .all()
+        )
+        return {row.symbol: row for row in rows}
+
+    @staticmethod
+    def get_recent_quotes(db: Session, max_age_seconds: int) -> List[models.PriceQuote]:
+        """
+        Latest stored quote per symbol, limited to those fetched within max_age_seconds.
+        """
+        cutoff = datetime.now() - timedelta(seconds=max_age_seconds)
+
+        latest_per_symbol = (
+            db.query(
+                models.PriceQuote.symbol,
+                func.max(models.PriceQuote.fetched_at).label("fetched_at"),
+            )
+            .filter(models.PriceQuote.fetched_at >= cutoff)
+            .group_by(models.PriceQuote.symbol)
+            .subquery()
+        )
+
+        return (
+            db.query(models.PriceQuote)
+            .join(
+                latest_per_symbol,
+                (models.PriceQuote.symbol == latest_per_symbol.c.symbol)
+                & (models.PriceQuote.fetched_at == latest_per_symbol.c.fetched_at),
+            )
+            .all()
+        )
+
+
+class TickerResolutionService:
+
+    @staticmethod
+    def save_resolutions(
+        db: Session, resolutions: Iterable[Tuple[str, str, Optional[str]]]
+    ) -> None:
+        """
+        Upsert (symbol, region, resolved_symbol) rows. A None resolved_symbol
+        records a not-found result, but never replaces a stored positive
+        resolution: one miss is not proof the listing is gone.
+        """
+        now = datetime.now()
+        latest = {(symbol, region): resolved for symbol, region, resolved in resolutions}
+        if not latest:
+            return
+
+        existing = {
+            (row.symbol, row.region): row
+            for row in db.query(models.TickerResolution).filter(
+                models.TickerResolution.symbol.in_({symbol for symbol, _ in latest})
+            )
+        }
+
+        for (symbol, region), resolved in latest.items():
+            row = existing.get((symbol, region))
+            if row and resolved is None and row.resolved_symbol:
+                continue
+            if row:
+                row.resolved_symbol = resolved
+                row.checked_at = now
+            else:
+                db.add(
+                    models.TickerResolution(
+                        symbol=symbol,
+                        region=region,
+                        resolved_symbol=resolved,
+                        checked_at=now,
+                    )
+                )
+
+        db.commit()
+
+    @staticmethod
+    def get_resolutions(db: Session, not_found_ttl_seconds: int) -> List[models.TickerResolution]:
+        """
+        All positive resolutions, plus not-found results checked within the TTL.
+        """
+        cutoff = datetime.now() - timedelta(seconds=not_found_ttl_seconds)
+        return (
+            db.query(models.TickerResolution)
+            .filter(
+                or_(
+                    models.TickerResolution.resolved_symbol.isnot(None),
+                    models.TickerResolution.checked_at >= cutoff,
+                )
+            )
+            .all()
+        )
+
+
+class StockProfileService:
+
+    @staticmethod
+    def get_profile(db: Session, symbol: str, region: str) -> Optional[models.StockProfile]:
+        return (
+            db.query(models.StockProfile)
+            .filter(
+                models.StockProfile.symbol == symbol,
+                models.StockProfile.region == region,
+            )
+            .first()
+        )
+
+    @staticmethod
+    def save_profile(
+        db: Session,
+        symbol: str,
+        region: str,
+        resolved_symbol: Optional[str],
+        website: Optional[str],
+    ) -> None:
+        row = StockProfileService.get_profile(db, symbol, region)
+        if not row:
+            row = models.StockProfile(symbol=symbol, region=region)
+            db.add(row)
+
+        row.resolved_symbol = resolved_symbol
+        row.website = website
+        row.fetched_at = datetime.now()
+        db.commit()
@@ -0,0 +1,196 @@
+import os
+import threading
+import uuid
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from src import models
+from src.database import SessionLocal
+from src.services.snapshot_service import SnapshotService
+
+# A RUNNING job whose heartbeat (updated_at) is older than this was interrupted
+# (crash, restart, another instance that died) and may be resumed
+SNAPSHOT_JOB_STALE_SECONDS = int(os.getenv("SNAPSHOT_JOB_STALE_SECONDS", "600"))
+
+# Jobs running in this process
+_running: Set[str] = set()
+_lock = threading.Lock()
+
+
+class SnapshotJobService:
+    """
+    Runs capture-all as a background job. Progress is written to the
+    snapshot_jobs row after every chunk, and last_uid checkpoints the users
+    that are done, so a rerun for the same date picks up after it.
+    """
+
+    @staticmethod
+    def get_job(db: Session, job_id: str) -> Optional[models.SnapshotJob]:
+        return db.query(models.SnapshotJob).filter(models.SnapshotJob.id == job_id).first()
+
+    @staticmethod
+    def start(db: Session, snapshot_date: date, force: bool = False) -> Tuple[models.SnapshotJob, bool]:
+        """
+        Start capture-all for snapshot_date in a background thread, or return
+        the run that already covers it:
+        - A job that is still running is returned as is.
+        - A COMPLETED job is returned as is, unless force starts a new one.
+        - A FAILED or interrupted job resumes from its checkpoint.
+        The database allows one RUNNING job per date; losing that race to
+        another instance or worker returns the job that won.
+        Returns:
+            tuple: (job, started) where started is False if nothing new was launched.
+        """
+        with _lock:
+            job = SnapshotJobService._latest_job(db, snapshot_date)
+
+            if job and SnapshotJobService._is_alive(job):
+                return job, False
+            if job and job.status == models.SnapshotJobStatus.COMPLETED and not force:
+                return job, False
+
+            # Other instances may be starting the same date: the unique index on
+            # RUNNING jobs rejects a second new job, and a resume only claims
+            # the row if nobody changed it since it was read
+            if not job or job.status == models.SnapshotJobStatus.COMPLETED:
+                job = models.SnapshotJob(
+                    id=uuid.uuid4().hex,
+                    snapshot_date=snapshot_date,
+                    status=models.SnapshotJobStatus.RUNNING,
+                    failures=[],
+                    updated_at=datetime.now(),
+                )
+                db.add(job)
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+                    return SnapshotJobService._latest_job(db, snapshot_date), False
+            else:
+                claimed = (
+                    db.query(models.SnapshotJob)
+                    .filter(
+                        models.SnapshotJob.id == job.id,
+                        models.SnapshotJob.status == job.status,
+                        models.SnapshotJob.updated_at == job.updated_at,
+                    )
+                    .update(
+                        {
+                            models.SnapshotJob.status: models.SnapshotJobStatus.RUNNING,
+                            models.SnapshotJob.error: None,
+                            models.SnapshotJob.finished_at: None,
+                            models.SnapshotJob.updated_at: datetime.now(),
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+                    claimed = 0
+                if not claimed:
+                    return SnapshotJobService._latest_job(db, snapshot_date), False
+                print(f"Resuming snapshot job {job.id} after uid {job.last_uid}")
+
+            db.refresh(job)
+            _running.add(job.id)
+
+        thread = threading.Thread(
+            target=SnapshotJobService.run, args=(job.id,), name=f"snapshot-job-{job.id[:8]}", daemon=True
+        )
+        thread.start()
+        return job, True
+
+    @staticmethod
+    def _latest_job(db: Session, snapshot_date: date) -> Optional[models.SnapshotJob]:
+        return (
+            db.query(models.SnapshotJob)
+            .filter(models.SnapshotJob.snapshot_date == snapshot_date)
+            .order_by(models.SnapshotJob.created_at.desc())
+            .first()
+        )
+
+    @staticmethod
+    def _is_alive(job: models.SnapshotJob) -> bool:
+        if job.id in _running:
+            return True
+        if job.status != models.SnapshotJobStatus.RUNNING:
+            return False
+        # Running elsewhere if its heartbeat is recent
+        return bool(job.updated_at) and datetime.now() - job.updated_at < timedelta(
+            seconds=SNAPSHOT_JOB_STALE_SECONDS
+        )
+
+    @staticmethod
+    def run(job_id: str) -> None:
+        """Job body; uses its own session and updates the job row after every chunk."""
+        db = SessionLocal()
+        job = None
+        try:
+            job = SnapshotJobService.get_job(db, job_id)
+
+            # Counts up to the checkpoint carry over; everything after it is redone
+            done_before = 0
+            failures: List[dict] = []
+            if job.last_uid is not None:
+                done_before = (
+                    db.query(func.count(models.User.uid))
+                    .filter(models.User.uid <= job.last_uid)
+                    .scalar()
+                )
+                failures = [f for f in job.failures or [] if f["uid"] <= job.last_uid]
+            remaining = db.query(func.count(models.User.uid))
+            if job.last_uid is not None:
+                remaining = remaining.filter(models.User.uid > job.last_uid)
+
+            job.total_users = done_before + remaining.scalar()
+            job.processed = done_before
+            job.failures = failures
+            job.failed = len(failures)
+            db.commit()
+
+            last_uids = {}
+            next_chunk = 0
+
+            def on_chunk(index: int, results: List[dict]) -> None:
+                nonlocal next_chunk
+                chunk_failures = [
+                    {"uid": r["uid"], "error": r["error"]} for r in results if r["status"] == "failed"
+                ]
+                job.processed += len(results)
+                job.failed += len(chunk_failures)
+                job.failures = job.failures + chunk_failures
+
+                # Chunks finish out of order; only move the checkpoint over a
+                # contiguous run of finished chunks
+                last_uids[index] = results[-1]["uid"]
+                while next_chunk in last_uids:
+                    job.last_uid = last_uids.pop(next_chunk)
+                    next_chunk += 1
+                db.commit()
+
+            SnapshotService.capture_all(db, job.snapshot_date, after_uid=job.last_uid, on_chunk=on_chunk)
+
+            job.status = models.SnapshotJobStatus.COMPLETED
+            job.finished_at = datetime.now()
+            db.commit()
+            print(f"Snapshot job {job_id} completed: {job.processed} users, {job.failed} failed.")
+        except Exception as e:
+            db.rollback()
+            print(f"Snapshot job {job_id} failed: {e}")
+            if job is not None:
+                try:
+                    job.status = models.SnapshotJobStatus.FAILED
+                    job.error = str(e)
+                    job.finished_at = datetime.now()
+                    db.commit()
+                except Exception:
+                    db.rollback()
+        finally:
+            db.close()
+            with _lock:
+                _running.discard(job_id)
@@ -1,92 +1,339 @@
-from datetime import date
-from typing import Dict
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import case, func, literal, null, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from src import models
+from src.database import SessionLocal, engine
 from src.services import market
+from src.services.market_client import market_client
+from src.services.prefetch_service import MARKET_ASSET_TYPES, MarketPrefetcher
+from src.services.valuation_service import Holdings, ValuationService
+
+# Threads used by capture-all; each holds one DB connection while it runs
+SNAPSHOT_WORKERS = int(os.getenv("SNAPSHOT_WORKERS", "4"))
+# Users valued and committed together by one worker
+SNAPSHOT_CHUNK_SIZE = int(os.getenv("SNAPSHOT_CHUNK_SIZE", "200"))
+# Rows per INSERT ... ON CONFLICT statement
+SNAPSHOT_UPSERT_BATCH_SIZE = 500
+
+# Base currencies every snapshot is stored in. TWD is always included: existing
+# history, per-asset valuations and the default read are in TWD.
+SNAPSHOT_PRIMARY_CURRENCY = "TWD"
+SNAPSHOT_CURRENCIES = [SNAPSHOT_PRIMARY_CURRENCY] + [
+    c for c in dict.fromkeys(
+        c.strip().upper() for c in os.getenv("SNAPSHOT_CURRENCIES", "TWD,USD,JPY").split(",")
+    )
+    if c and c != SNAPSHOT_PRIMARY_CURRENCY and c in market.SUPPORTED_CURRENCIES
+]
+
+# Periods kept in asset_snapshot_rollups
+ROLLUP_RESOLUTIONS = [models.SnapshotResolution.WEEK, models.SnapshotResolution.MONTH]
+
 
 class SnapshotService:
     @staticmethod
-    def create_daily_snapshot(db: Session, user_id: str, snapshot_date: date = None) -> float:
+    def create_daily_snapshots(
+        db: Session, snapshot_date: date, user_ids: Optional[List[str]] = None
+    ) -> List[dict]:
         """
-        Creates or updates the asset snapshot for a specific user and date.
-        
-        Logic:
-        1. total_net_worth: STRICTLY sums only assets with include_in_net_worth=True.
-        2. breakdown: 
-           - For Assets (Cash, Stock): Include only if include_in_net_worth=True.
-           - For Liabilities (Card, Loan): ALWAYS include (to track debt trends).
+        Creates or updates snapshots for many users (default: all users) with one
+        batched valuation: assets are loaded in one query and each distinct
+        symbol / currency is priced once, however many users hold it, and each
+        SNAPSHOT_CURRENCIES total comes from the same pass (one FX broadcast).
+        Rows are written with bulk upserts, each asset's value is recorded in
+        asset_valuation_snapshots, and the whole batch is committed once.
+
+        Returns:
+            list: One {"uid", "status", "net_worth" | "error"} entry per user;
+                net_worth is in TWD, and a user fails if any of its currencies does.
         """
-        if not snapshot_date:
-            snapshot_date = date.today()
-
-        # 1. Fetch active assets for the user
-        assets = db.query(models.Asset).filter(
-            models.Asset.user_id == user_id,
-            models.Asset.status == models.AssetStatus.ACTIVE
-        ).all()
-
-        total_net_worth = 0.0
-        breakdown: Dict[str, float] = {}
-
-        # 2. Iterate through assets to calculate values
-        for asset in assets:
-            
-            # --- Valuation Logic (Same as before) ---
-            is_market_asset = asset.asset_type in [
-                models.AssetType.STOCK,
-                models.AssetType.CRYPTO,
-                models.AssetType.GOLD
-            ]
-
-            # Get current market price (in native currency)
-            current_price = 1.0
-            if is_market_asset:
-                if asset.symbol:
-                    try:
-                        region = asset.meta_data.get("region", "US") if asset.meta_data else "US"
-                        # Optimization: In production, batch fetch prices outside the loop
-                        quote = market.get_stock_data(asset.symbol, region)
-                        current_price = quote.get("price", 0.0)
-                    except Exception:
-                        current_price = asset.average_cost
-                else:
-                    current_price = asset.average_cost
-
-            # Calculate Native Market Value
-            native_value = 0.0
-            if is_market_asset:
-                price_to_use = current_price if current_price > 0 else asset.average_cost
-                native_value = asset.quantity * price_to_use
+        if user_ids is None:
+            user_ids = [uid for (uid,) in db.query(models.User.uid).all()]
+            # Every ACTIVE asset belongs to some user, so skip the IN (...) filter
+            holdings = ValuationService.load_holdings(db)
+        else:
+            holdings = ValuationService.load_holdings(db, user_ids)
+        rows = ValuationService.price_rows_by_currency(holdings, SNAPSHOT_CURRENCIES)
+
+        snapshots = []
+        for currency in SNAPSHOT_CURRENCIES:
+            valuations = ValuationService.summarize(holdings, rows[currency])
+            snapshots.extend(
+                (user_id, snapshot_date, currency, *valuations.get(user_id, (0.0, {}))) for user_id in user_ids
+            )
+        errors = SnapshotService.bulk_upsert_snapshots(db, snapshots)
+        SnapshotService.save_asset_valuations(
+            db, snapshot_date, user_ids, holdings, rows[SNAPSHOT_PRIMARY_CURRENCY]
+        )
+
+        failed: Dict[str, str] = {}
+        for (user_id, _, _), error in errors.items():
+            failed.setdefault(user_id, error)
+
+        # The TWD snapshots come first, one per user
+        results = []
+        for user_id, _, _, total_net_worth, _ in snapshots[:len(user_ids)]:
+            error = failed.get(user_id)
+            if error:
+                print(f"Failed snapshot for user {user_id}: {error}")
+                results.append({"uid": user_id, "status": "failed", "error": error})
             else:
-                native_value = asset.book_value
+                results.append({"uid": user_id, "status": "success", "net_worth": total_net_worth})
+
+        try:
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Failed to commit snapshots for {len(user_ids)} users: {e}")
+            return [{"uid": user_id, "status": "failed", "error": str(e)} for user_id in user_ids]
+
+        return results
+
+    @staticmethod
+    def capture_all(
+        db: Session,
+        snapshot_date: date,
+        workers: int = SNAPSHOT_WORKERS,
+        chunk_size: int = SNAPSHOT_CHUNK_SIZE,
+        after_uid: Optional[str] = None,
+        on_chunk: Optional[Callable[[int, List[dict]], None]] = None,
+    ) -> List[dict]:
+        """
+        Snapshot every user, split into chunks of `chunk_size` users (in uid
+        order) that run on a pool of `workers` threads. Each chunk uses its own
+        session and commits once; a chunk whose batched valuation fails is
+        retried user by user, so only the offending users fail.
 
-            # Convert to Base Currency (TWD)
-            base_currency = "TWD"
-            exchange_rate = 1.0
-            if asset.currency != base_currency:
+        Quotes for every held symbol and the FX matrix are fetched once up front,
+        so the chunks value their users from warm caches.
+
+        Args:
+            after_uid: Only users with a greater uid are processed (resume point).
+            on_chunk: Called as on_chunk(chunk_index, results) on the calling
+                thread as each chunk finishes, in completion order.
+        """
+        query = db.query(models.User.uid).order_by(models.User.uid)
+        if after_uid is not None:
+            query = query.filter(models.User.uid > after_uid)
+        user_ids = [uid for (uid,) in query.all()]
+        if not user_ids:
+            return []
+
+        region_map = MarketPrefetcher.get_held_symbols(db)
+        try:
+            if region_map:
+                market_client.run(market_client.get_stock_data_many(list(region_map), region_map))
+            market.rate_matrix.get_snapshot()
+        except Exception as e:
+            # Chunks fall back to their own lookups
+            print(f"Failed to warm market data for snapshots: {e}")
+
+        # SQLite allows a single writer; parallel chunks would only hit "database is locked"
+        if engine.dialect.name == "sqlite":
+            workers = 1
+
+        chunk_size = max(chunk_size, 1)
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+        print(f"Capturing {len(user_ids)} users in {len(chunks)} chunks on {workers} workers...")
+
+        chunk_results: List[List[dict]] = [[] for _ in chunks]
+        with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="snapshot") as pool:
+            futures = {
+                pool.submit(SnapshotService._capture_chunk, chunk, snapshot_date): i
+                for i, chunk in enumerate(chunks)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                chunk_results[i] = future.result()
+                if on_chunk:
+                    on_chunk(i, chunk_results[i])
+
+        return [result for results in chunk_results for result in results]
+
+    @staticmethod
+    def _capture_chunk(user_ids: List[str], snapshot_date: date) -> List[dict]:
+        db = SessionLocal()
+        try:
+            try:
+                return SnapshotService.create_daily_snapshots(db, snapshot_date, user_ids)
+            except Exception as e:
+                db.rollback()
+                if len(user_ids) == 1:
+                    print(f"Failed snapshot for user {user_ids[0]}: {e}")
+                    return [{"uid": user_ids[0], "status": "failed", "error": str(e)}]
+                print(f"Failed snapshot chunk of {len(user_ids)} users, retrying user by user: {e}")
+
+            # One user's bad data must not fail the rest of the chunk
+            results = []
+            for user_id in user_ids:
                 try:
-                    exchange_rate = market.get_exchange_rate(asset.currency, base_currency)
-                except Exception:
-                    exchange_rate = 1.0
-            
-            base_market_value = native_value * exchange_rate
-            
-            if asset.include_in_net_worth:
-                total_net_worth += base_market_value
-
-            is_liability_type = asset.asset_type in [models.AssetType.LIABILITY, models.AssetType.CREDIT_CARD]
-            
-            should_record_in_breakdown = asset.include_in_net_worth or is_liability_type
-            
-            if should_record_in_breakdown:
-                asset_type_key = asset.asset_type.value
-                current_type_val = breakdown.get(asset_type_key, 0.0)
-                breakdown[asset_type_key] = current_type_val + base_market_value
-
-        # 3. Upsert snapshot record
+                    results.extend(SnapshotService.create_daily_snapshots(db, snapshot_date, [user_id]))
+                except Exception as e:
+                    db.rollback()
+                    print(f"Failed snapshot for user {user_id}: {e}")
+                    results.append({"uid": user_id, "status": "failed", "error": str(e)})
+            return results
+        finally:
+            db.close()
+
+    @staticmethod
+    def bulk_upsert_snapshots(
+        db: Session, snapshots: List[Tuple[str, date, str, float, Dict[str, float]]]
+    ) -> Dict[Tuple[str, date, str], str]:
+        """
+        Insert or update (user_id, snapshot_date, currency, total_net_worth, breakdown)
+        snapshots in batched INSERT ... ON CONFLICT (user_id, snapshot_date, currency)
+        DO UPDATE statements, and roll them into the week / month rollups.
+        A batch that fails is retried row by row, so only the offending rows
+        fail. Other databases fall back to per-row upserts. The caller commits.
+
+        Returns:
+            dict: (user_id, snapshot_date, currency) -> error message for every row that could not be written.
+        """
+        insert = _upsert_insert(db)
+        errors: Dict[Tuple[str, date, str], str] = {}
+
+        for start in range(0, len(snapshots), SNAPSHOT_UPSERT_BATCH_SIZE):
+            batch = snapshots[start:start + SNAPSHOT_UPSERT_BATCH_SIZE]
+
+            if insert is not None:
+                try:
+                    with db.begin_nested():
+                        stmt = insert(models.AssetSnapshot).values([
+                            {
+                                "user_id": user_id,
+                                "snapshot_date": snapshot_date,
+                                "currency": currency,
+                                "total_net_worth": total_net_worth,
+                                "breakdown": breakdown,
+                            }
+                            for user_id, snapshot_date, currency, total_net_worth, breakdown in batch
+                        ])
+                        # Conflict target is the _user_date_currency_uc unique constraint
+                        stmt = stmt.on_conflict_do_update(
+                            index_elements=["user_id", "snapshot_date", "currency"],
+                            set_={
+                                "total_net_worth": stmt.excluded.total_net_worth,
+                                "breakdown": stmt.excluded.breakdown,
+                            },
+                        )
+                        db.execute(stmt)
+                        SnapshotService._upsert_rollups(db, insert, batch)
+                    continue
+                except Exception as e:
+                    print(f"Bulk snapshot upsert failed, retrying row by row: {e}")
+
+            for user_id, snapshot_date, currency, total_net_worth, breakdown in batch:
+                try:
+                    with db.begin_nested():
+                        SnapshotService._save_snapshot(
+                            db, user_id, snapshot_date, currency, total_net_worth, breakdown
+                        )
+                except Exception as e:
+                    errors[(user_id, snapshot_date, currency)] = str(e)
+
+        return errors
+
+    @staticmethod
+    def save_asset_valuations(
+        db: Session,
+        snapshot_date: date,
+        user_ids: List[str],
+        holdings: Holdings,
+        rows: Dict[str, np.ndarray],
+    ) -> None:
+        """
+        Replace the asset_valuation_snapshots rows of user_ids on snapshot_date
+        with one row per ACTIVE asset, in batched DELETE and INSERT statements.
+        Replacing rather than upserting also drops assets archived or deleted
+        since an earlier run for the same day. Errors propagate, so the caller's
+        rollback keeps the previous rows (and _capture_chunk retries per user);
+        the caller commits.
+
+        Market assets come from holdings with their ValuationService.price_rows
+        values. Book-value assets are summed per group in holdings, so their
+        rows are copied from assets by INSERT ... SELECT instead, with the FX
+        rates resolved for holdings inlined as a CASE on currency; they never
+        leave the database.
+        """
+        cols = holdings.columns()
+        values = [
+            {
+                "user_id": holdings.user_ids[user_idx],
+                "asset_id": asset_id,
+                "snapshot_date": snapshot_date,
+                "quantity": quantity,
+                "price": None if np.isnan(price) else price,
+                "fx_rate": fx_rate,
+                "base_value": base_value,
+            }
+            for asset_id, user_idx, quantity, price, fx_rate, base_value in zip(
+                cols["asset_id"].tolist(),
+                cols["user_idx"].tolist(),
+                cols["quantity"].tolist(),
+                rows["price"].tolist(),
+                rows["fx_rate"].tolist(),
+                rows["base_value"].tolist(),
+            )
+            if asset_id >= 0
+        ]
+
+        # Every held currency has at least one row, and rows sharing a currency share its rate
+        fx_rates = {
+            holdings.currencies[currency_idx]: fx_rate
+            for currency_idx, fx_rate in zip(cols["currency_idx"].tolist(), rows["fx_rate"].tolist())
+        }
+        fx_rate = (
+            case(fx_rates, value=func.upper(models.Asset.currency), else_=1.0)
+            if fx_rates else literal(1.0)
+        )
+
+        table = models.AssetValuationSnapshot.__table__
+        for start in range(0, len(user_ids), SNAPSHOT_UPSERT_BATCH_SIZE):
+            batch = user_ids[start:start + SNAPSHOT_UPSERT_BATCH_SIZE]
+            db.execute(table.delete().where(
+                table.c.snapshot_date == snapshot_date,
+                table.c.user_id.in_(batch),
+            ))
+            book_value_assets = select(
+                models.Asset.user_id,
+                models.Asset.id,
+                literal(snapshot_date),
+                models.Asset.quantity,
+                null(),
+                fx_rate,
+                func.coalesce(models.Asset.book_value, 0.0) * fx_rate,
+            ).where(
+                models.Asset.status == models.AssetStatus.ACTIVE,
+                models.Asset.asset_type.notin_(MARKET_ASSET_TYPES),
+                models.Asset.user_id.in_(batch),
+            )
+            db.execute(table.insert().from_select(
+                ["user_id", "asset_id", "snapshot_date", "quantity", "price", "fx_rate", "base_value"],
+                book_value_assets,
+            ))
+        for start in range(0, len(values), SNAPSHOT_UPSERT_BATCH_SIZE):
+            db.execute(table.insert(), values[start:start + SNAPSHOT_UPSERT_BATCH_SIZE])
+
+    @staticmethod
+    def _save_snapshot(
+        db: Session,
+        user_id: str,
+        snapshot_date: date,
+        currency: str,
+        total_net_worth: float,
+        breakdown: Dict[str, float],
+    ) -> None:
+        # Upsert snapshot record (caller commits)
         existing_snapshot = db.query(models.AssetSnapshot).filter(
             models.AssetSnapshot.user_id == user_id,
-            models.AssetSnapshot.snapshot_date == snapshot_date
+            models.AssetSnapshot.snapshot_date == snapshot_date,
+            models.AssetSnapshot.currency == currency,
         ).first()
 
         if existing_snapshot:
@@ -96,11 +343,120 @@ class SnapshotService:
             new_snapshot = models.AssetSnapshot(
                 user_id=user_id,
                 snapshot_date=snapshot_date,
+                currency=currency,
                 total_net_worth=total_net_worth,
                 breakdown=breakdown
             )
             db.add(new_snapshot)
-        
-        db.commit()
-        
-        return total_net_worth
+
+        SnapshotService._save_rollups(db, user_id, snapshot_date, currency, total_net_worth, breakdown)
+
+    @staticmethod
+    def _upsert_rollups(
+        db: Session, insert, snapshots: List[Tuple[str, date, str, float, Dict[str, float]]]
+    ) -> None:
+        """
+        Make each snapshot the closing row of its week and month unless the
+        rollup already holds a later day, in one INSERT ... ON CONFLICT statement.
+        """
+        closing: Dict[tuple, dict] = {}
+        for user_id, snapshot_date, currency, total_net_worth, breakdown in snapshots:
+            for resolution in ROLLUP_RESOLUTIONS:
+                key = (user_id, resolution, get_period_start(snapshot_date, resolution), currency)
+                # A statement may touch each conflict row only once
+                if key in closing and closing[key]["snapshot_date"] > snapshot_date:
+                    continue
+                closing[key] = {
+                    "user_id": user_id,
+                    "resolution": resolution,
+                    "period_start": key[2],
+                    "snapshot_date": snapshot_date,
+                    "currency": currency,
+                    "total_net_worth": total_net_worth,
+                    "breakdown": breakdown,
+                }
+        if not closing:
+            return
+
+        rollups = models.AssetSnapshotRollup.__table__
+        stmt = insert(rollups).values(list(closing.values()))
+        # Conflict target is the _user_resolution_period_currency_uc unique constraint
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "resolution", "period_start", "currency"],
+            set_={
+                "snapshot_date": stmt.excluded.snapshot_date,
+                "total_net_worth": stmt.excluded.total_net_worth,
+                "breakdown": stmt.excluded.breakdown,
+            },
+            where=stmt.excluded.snapshot_date >= rollups.c.snapshot_date,
+        )
+        db.execute(stmt)
+
+    @staticmethod
+    def _save_rollups(
+        db: Session,
+        user_id: str,
+        snapshot_date: date,
+        currency: str,
+        total_net_worth: float,
+        breakdown: Dict[str, float],
+    ) -> None:
+        for resolution in ROLLUP_RESOLUTIONS:
+            period_start = get_period_start(snapshot_date, resolution)
+            rollup = db.query(models.AssetSnapshotRollup).filter(
+                models.AssetSnapshotRollup.user_id == user_id,
+                models.AssetSnapshotRollup.resolution == resolution,
+                models.AssetSnapshotRollup.period_start == period_start,
+                models.AssetSnapshotRollup.currency == currency,
+            ).first()
+
+            if rollup is None:
+                db.add(models.AssetSnapshotRollup(
+                    user_id=user_id,
+                    resolution=resolution,
+                    period_start=period_start,
+                    snapshot_date=snapshot_date,
+                    currency=currency,
+                    total_net_worth=total_net_worth,
+                    breakdown=breakdown,
+                ))
+            elif snapshot_date >= rollup.snapshot_date:
+                rollup.snapshot_date = snapshot_date
+                rollup.total_net_worth = total_net_worth
+                rollup.breakdown = breakdown
+
+
+def to_columnar(rows: List[Tuple[date, float, Optional[Dict[str, float]]]]) -> Dict[str, Any]:
+    """
+    (snapshot_date, total_net_worth, breakdown) rows -> parallel arrays:
+    {"dates": [...], "total_net_worth": [...], "breakdown": {asset_type: [...]}}.
+    Asset types missing on a day are 0; values are rounded to 2 decimals.
+    """
+    asset_types = sorted({key for _, _, breakdown in rows for key in (breakdown or {})})
+    return {
+        "dates": [snapshot_date.isoformat() for snapshot_date, _, _ in rows],
+        "total_net_worth": [round(total, 2) for _, total, _ in rows],
+        "breakdown": {
+            asset_type: [round((breakdown or {}).get(asset_type, 0.0), 2) for _, _, breakdown in rows]
+            for asset_type in asset_types
+        },
+    }
+
+
+def get_period_start(day: date, resolution: models.SnapshotResolution) -> date:
+    """First day of the week (Monday) or month containing day."""
+    if resolution == models.SnapshotResolution.WEEK:
+        return day - timedelta(days=day.weekday())
+    if resolution == models.SnapshotResolution.MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def _upsert_insert(db: Session):
+    """Dialect insert() that supports on_conflict_do_update, or None if the database has none."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    return None
@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 
 from src import models
 from src import schemas
+from src.services.valuation_service import holdings_cache
 
 
 class TransactionService:
@@ -203,7 +204,9 @@ class TransactionService:
         )
 
         db.add(db_tx)
+        holdings_cache.touch(db, current_user)
         db.commit()
+        holdings_cache.invalidate(current_user)
         db.refresh(db_tx)
 
         return db_tx
@@ -289,6 +292,8 @@ class TransactionService:
             asset.quantity -= qty_delta
 
         db.delete(tx)
+        holdings_cache.touch(db, current_user)
         db.commit()
+        holdings_cache.invalidate(current_user)
 
         return {"message": "Transaction deleted and asset balance rolled back"}
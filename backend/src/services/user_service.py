@@ -4,6 +4,7 @@ from typing import Optional, Dict, Any, List
 from sqlalchemy import desc, asc, case
 from sqlalchemy.orm import Session
 from src import models
+from src.services.valuation_service import holdings_cache
 
 OWNER_EMAILS = set(e.strip() for e in os.getenv("OWNER_EMAILS", "").split(",") if e.strip())
 ADMIN_EMAILS = set(e.strip() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip())
@@ -157,11 +158,18 @@ class UserService:
         # Delete Transactions
         db.query(models.Transaction).filter(models.Transaction.user_id == uid).delete()
 
+        # Delete Per-Asset Valuations (they reference assets)
+        db.query(models.AssetValuationSnapshot).filter(models.AssetValuationSnapshot.user_id == uid).delete()
+
         # Delete Assets
         db.query(models.Asset).filter(models.Asset.user_id == uid).delete()
 
+        # Delete Snapshot Rollups
+        db.query(models.AssetSnapshotRollup).filter(models.AssetSnapshotRollup.user_id == uid).delete()
+
         # Delete User
         db.delete(user)
         
         db.commit()
+        holdings_cache.invalidate(uid)
         return True
@@ -0,0 +1,406 @@
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from src import models
+from src.services import market
+from src.services.market_client import market_client
+from src.services.prefetch_service import MARKET_ASSET_TYPES
+from src.utils import TTLCache
+
+LIABILITY_TYPES = [models.AssetType.LIABILITY, models.AssetType.CREDIT_CARD]
+
+ASSET_TYPES = list(models.AssetType)
+ASSET_TYPE_INDEX = {asset_type: i for i, asset_type in enumerate(ASSET_TYPES)}
+
+# Rows fetched per round trip while streaming assets
+VALUATION_FETCH_SIZE = 1000
+
+# Upper bound on how long an untouched user's holdings stay cached
+VALUATION_CACHE_TTL_SECONDS = int(os.getenv("VALUATION_CACHE_TTL_SECONDS", "3600"))
+
+
+class Holdings:
+    """
+    Column arrays for a set of ACTIVE assets: one entry per market asset and
+    one per summed group of book-value assets. Users, price keys and currencies
+    are stored once and referenced by index, so prices and FX are resolved per
+    distinct symbol / currency, not per asset.
+    """
+
+    def __init__(self):
+        self.user_ids: List[str] = []
+        # (ticker as entered, region) per price key, e.g. ('8069', 'TW'): the same
+        # keys market.py resolves and caches user-facing lookups under
+        self.price_keys: List[Tuple[str, str]] = []
+        self.currencies: List[str] = []
+
+        self._user_index: Dict[str, int] = {}
+        self._price_index: Dict[Tuple[str, str], int] = {}
+        self._currency_index: Dict[str, int] = {}
+        self._rows: List[tuple] = []
+        self._columns: Optional[Dict[str, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add_user(self, user_id: str) -> int:
+        idx = self._user_index.get(user_id)
+        if idx is None:
+            idx = self._user_index[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+        return idx
+
+    def add(
+        self,
+        asset_id: Optional[int],
+        user_id: str,
+        asset_type: models.AssetType,
+        currency: Optional[str],
+        symbol: Optional[str],
+        meta_data: Optional[dict],
+        quantity: Optional[float],
+        average_cost: Optional[float],
+        book_value: Optional[float],
+        include_in_net_worth: Optional[bool],
+    ) -> None:
+        is_market = asset_type in MARKET_ASSET_TYPES
+
+        price_idx = -1
+        if is_market and symbol:
+            region = meta_data.get("region", "US") if meta_data else "US"
+            key = (symbol.upper().strip(), region)
+            price_idx = self._price_index.get(key, -1)
+            if price_idx < 0:
+                price_idx = self._price_index[key] = len(self.price_keys)
+                self.price_keys.append(key)
+
+        currency = (currency or "TWD").upper()
+        currency_idx = self._currency_index.get(currency)
+        if currency_idx is None:
+            currency_idx = self._currency_index[currency] = len(self.currencies)
+            self.currencies.append(currency)
+
+        self._columns = None
+        self._rows.append((
+            -1 if asset_id is None else asset_id,
+            self.add_user(user_id),
+            ASSET_TYPE_INDEX[asset_type],
+            price_idx,
+            currency_idx,
+            is_market,
+            asset_type in LIABILITY_TYPES,
+            bool(include_in_net_worth),
+            quantity or 0.0,
+            average_cost or 0.0,
+            book_value or 0.0,
+        ))
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """The stored rows as one NumPy array per field (built once, then reused)."""
+        if self._columns is not None:
+            return self._columns
+
+        fields = [
+            ("asset_id", np.int64),  # -1 for summed groups
+            ("user_idx", np.intp),
+            ("type_idx", np.intp),
+            ("price_idx", np.intp),
+            ("currency_idx", np.intp),
+            ("is_market", bool),
+            ("is_liability", bool),
+            ("include", bool),
+            ("quantity", float),
+            ("average_cost", float),
+            ("book_value", float),
+        ]
+        self._columns = {
+            name: np.array([row[i] for row in self._rows], dtype=dtype)
+            for i, (name, dtype) in enumerate(fields)
+        }
+        return self._columns
+
+
+class ValuationService:
+
+    @staticmethod
+    def load_holdings(db: Session, user_ids: Optional[List[str]] = None) -> Holdings:
+        """
+        ACTIVE assets of the given users (or of everyone) in two queries:
+        - Market assets (STOCK, CRYPTO, GOLD) are streamed one row per asset,
+          since each needs its own price.
+        - Everything else is valued at book_value, so the database sums it per
+          (user, type, currency, include_in_net_worth) and only the groups come back.
+        Only the columns valuation needs are selected, so no ORM objects are built.
+        """
+        holdings = Holdings()
+        for user_id in user_ids or []:
+            holdings.add_user(user_id)
+
+        def active(query):
+            query = query.filter(models.Asset.status == models.AssetStatus.ACTIVE)
+            if user_ids is not None:
+                query = query.filter(models.Asset.user_id.in_(user_ids))
+            return query
+
+        market_assets = active(
+            db.query(
+                models.Asset.id,
+                models.Asset.user_id,
+                models.Asset.asset_type,
+                models.Asset.currency,
+                models.Asset.symbol,
+                models.Asset.meta_data,
+                models.Asset.quantity,
+                models.Asset.average_cost,
+                models.Asset.book_value,
+                models.Asset.include_in_net_worth,
+            ).filter(models.Asset.asset_type.in_(MARKET_ASSET_TYPES))
+        )
+        for row in market_assets.yield_per(VALUATION_FETCH_SIZE):
+            holdings.add(*row)
+
+        book_value_groups = active(
+            db.query(
+                models.Asset.user_id,
+                models.Asset.asset_type,
+                models.Asset.currency,
+                models.Asset.include_in_net_worth,
+                func.sum(models.Asset.book_value),
+            ).filter(models.Asset.asset_type.notin_(MARKET_ASSET_TYPES))
+        ).group_by(
+            models.Asset.user_id,
+            models.Asset.asset_type,
+            models.Asset.currency,
+            models.Asset.include_in_net_worth,
+        )
+        for user_id, asset_type, currency, include_in_net_worth, book_value in (
+            book_value_groups.yield_per(VALUATION_FETCH_SIZE)
+        ):
+            holdings.add(
+                None, user_id, asset_type, currency, None, None, 0.0, 0.0, book_value, include_in_net_worth
+            )
+
+        return holdings
+
+    @staticmethod
+    def resolve_prices(holdings: Holdings) -> np.ndarray:
+        """
+        Latest price per price key, fetched with one bulk lookup (one per
+        region when the same ticker is held under several regions).
+        NaN where the symbol could not be priced.
+        """
+        prices = np.full(len(holdings.price_keys), np.nan)
+        pending = list(enumerate(holdings.price_keys))
+        while pending:
+            batch: Dict[str, Tuple[int, str]] = {}
+            rest = []
+            for i, (ticker, region) in pending:
+                if ticker in batch:
+                    rest.append((i, (ticker, region)))
+                else:
+                    batch[ticker] = (i, region)
+            pending = rest
+
+            try:
+                quotes = market_client.run(market_client.get_stock_data_many(
+                    list(batch), {ticker: region for ticker, (_, region) in batch.items()}
+                ))
+            except Exception as e:
+                print(f"Bulk price lookup failed: {e}")
+                continue
+
+            for ticker, (i, _) in batch.items():
+                quote = quotes.get(ticker)
+                if quote and quote.get("price"):
+                    prices[i] = quote["price"]
+        return prices
+
+    @staticmethod
+    def resolve_fx_matrix(holdings: Holdings, base_currencies: List[str]) -> np.ndarray:
+        """
+        Rates from each held currency (rows) to each base currency (columns),
+        gathered from one rate matrix snapshot in a single indexing step.
+        Falls back to 1.0 where a rate is unavailable.
+        """
+        rates = np.ones((len(holdings.currencies), len(base_currencies)))
+        try:
+            snapshot = market.rate_matrix.get_snapshot()
+        except Exception as e:
+            print(f"Exchange rate lookup failed: {e}")
+            return rates
+
+        held = np.array([snapshot.index.get(c, -1) for c in holdings.currencies], dtype=np.intp)
+        bases = np.array([snapshot.index.get(c, -1) for c in base_currencies], dtype=np.intp)
+        found = snapshot.matrix[np.ix_(np.maximum(held, 0), np.maximum(bases, 0))]
+
+        known = (held >= 0)[:, np.newaxis] & (bases >= 0)[np.newaxis, :] & np.isfinite(found)
+        rates[known] = found[known]
+        # Same currency is exactly 1.0, even when it is missing from the matrix
+        same = np.array(holdings.currencies, dtype=object)[:, np.newaxis] == np.array(base_currencies, dtype=object)
+        rates[same] = 1.0
+        return rates
+
+    @staticmethod
+    def value_holdings(
+        holdings: Holdings, base_currency: str = "TWD"
+    ) -> Dict[str, Tuple[float, Dict[str, float]]]:
+        """
+        Net worth and per-type breakdown of every user in holdings, with
+        current prices and FX applied. Only reads holdings, so a cached
+        Holdings can be revalued on every call.
+
+        Logic:
+        1. total_net_worth: STRICTLY sums only assets with include_in_net_worth=True.
+        2. breakdown:
+           - For Assets (Cash, Stock): Include only if include_in_net_worth=True.
+           - For Liabilities (Card, Loan): ALWAYS include (to track debt trends).
+        Market assets are valued at quantity x latest price, falling back to
+        average_cost when no price is available; everything else at book_value.
+
+        Returns:
+            dict: user_id -> (total_net_worth, breakdown) for every user in holdings.
+        """
+        return ValuationService.summarize(holdings, ValuationService.price_rows(holdings, base_currency))
+
+    @staticmethod
+    def price_rows(holdings: Holdings, base_currency: str = "TWD") -> Dict[str, np.ndarray]:
+        """
+        Per-row valuation of holdings, as arrays aligned with holdings.columns():
+        - price: unit price used for market rows (NaN for book-value rows).
+        - fx_rate: rate from the row's currency to base_currency.
+        - base_value: the row's value in base_currency.
+        """
+        base_currency = base_currency.upper()
+        return ValuationService.price_rows_by_currency(holdings, [base_currency])[base_currency]
+
+    @staticmethod
+    def price_rows_by_currency(
+        holdings: Holdings, base_currencies: List[str]
+    ) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        price_rows for several base currencies at once: prices and native values
+        are computed once, then converted through an (asset x currency) FX
+        matrix in one broadcast.
+
+        Returns:
+            dict: base currency -> {"price", "fx_rate", "base_value"} arrays.
+        """
+        base_currencies = [c.upper() for c in base_currencies]
+        cols = holdings.columns()
+        if not len(holdings):
+            empty = np.zeros(0)
+            return {c: {"price": empty, "fx_rate": empty, "base_value": empty} for c in base_currencies}
+
+        prices = ValuationService.resolve_prices(holdings)
+        fx = ValuationService.resolve_fx_matrix(holdings, base_currencies)
+
+        # NaN (unpriced or no symbol) and non-positive prices fall back to average_cost
+        priced = cols["price_idx"] >= 0
+        price = np.full(len(holdings), np.nan)
+        price[priced] = prices[cols["price_idx"][priced]]
+        price = np.where(price > 0, price, cols["average_cost"])
+        price = np.where(cols["is_market"], price, np.nan)
+        native_value = np.where(cols["is_market"], cols["quantity"] * price, cols["book_value"])
+
+        fx_rate = fx[cols["currency_idx"]]
+        base_value = native_value[:, np.newaxis] * fx_rate
+        return {
+            currency: {"price": price, "fx_rate": fx_rate[:, j], "base_value": base_value[:, j]}
+            for j, currency in enumerate(base_currencies)
+        }
+
+    @staticmethod
+    def summarize(
+        holdings: Holdings, rows: Dict[str, np.ndarray]
+    ) -> Dict[str, Tuple[float, Dict[str, float]]]:
+        """Per-user total and breakdown from price_rows output (rules in value_holdings)."""
+        n_users = len(holdings.user_ids)
+        if not len(holdings):
+            return {user_id: (0.0, {}) for user_id in holdings.user_ids}
+
+        cols = holdings.columns()
+        base_value = rows["base_value"]
+
+        totals = np.bincount(
+            cols["user_idx"],
+            weights=np.where(cols["include"], base_value, 0.0),
+            minlength=n_users,
+        )
+
+        recorded = cols["include"] | cols["is_liability"]
+        n_types = len(ASSET_TYPES)
+        cell = cols["user_idx"][recorded] * n_types + cols["type_idx"][recorded]
+        type_sums = np.bincount(
+            cell, weights=base_value[recorded], minlength=n_users * n_types
+        ).reshape(n_users, n_types)
+        type_present = np.bincount(cell, minlength=n_users * n_types).reshape(n_users, n_types) > 0
+
+        results: Dict[str, Tuple[float, Dict[str, float]]] = {}
+        for u, user_id in enumerate(holdings.user_ids):
+            breakdown = {
+                ASSET_TYPES[t].value: float(type_sums[u, t])
+                for t in np.flatnonzero(type_present[u])
+            }
+            results[user_id] = (float(totals[u]), breakdown)
+        return results
+
+    @staticmethod
+    def get_user_valuation(
+        db: Session, user_id: str, base_currency: str = "TWD"
+    ) -> Tuple[float, Dict[str, float]]:
+        """
+        Current net worth and breakdown of one user. Holdings come from
+        holdings_cache (loaded on a miss); prices and FX are re-applied on
+        every call from the shared quote cache and rate matrix.
+        """
+        holdings = holdings_cache.get_or_load(
+            db, user_id, lambda: ValuationService.load_holdings(db, [user_id])
+        )
+        return ValuationService.value_holdings(holdings, base_currency)[user_id]
+
+
+class HoldingsCache:
+    """
+    Per-user Holdings for live valuation. Each entry records the user's
+    holdings_version it was loaded at and is only served while the database
+    still has that version, so writes made through any instance are seen on
+    the next read. AssetService and TransactionService bump the version in the
+    same commit as the change (touch) and drop the local entry (invalidate).
+    The TTL only bounds memory for inactive users.
+    """
+
+    def __init__(self, ttl_seconds: int = VALUATION_CACHE_TTL_SECONDS, max_size: int = 10000):
+        # user_id -> (holdings_version, Holdings)
+        self._cache = TTLCache(ttl_seconds=ttl_seconds, max_size=max_size)
+
+    def get_or_load(self, db: Session, user_id: str, load: Callable[[], Holdings]) -> Holdings:
+        # Read before loading: a write committed in between only makes the entry look stale
+        version = db.query(models.User.holdings_version).filter(models.User.uid == user_id).scalar()
+        entry = self._cache.get(user_id)
+        if entry is not None and version is not None and entry[0] == version:
+            return entry[1]
+
+        holdings = load()
+        if version is not None:
+            self._cache.set(user_id, (version, holdings))
+        return holdings
+
+    @staticmethod
+    def touch(db: Session, user_id: str) -> None:
+        """Bump the user's holdings_version; the caller commits it with the change."""
+        db.query(models.User).filter(models.User.uid == user_id).update(
+            {models.User.holdings_version: models.User.holdings_version + 1},
+            synchronize_session=False,
+        )
+
+    def invalidate(self, user_id: str) -> None:
+        self._cache.delete(user_id)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+holdings_cache = HoldingsCache()
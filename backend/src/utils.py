@@ -1,31 +1,313 @@
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional, Tuple
+
 
 class TTLCache:
-    def __init__(self, ttl_seconds: int = 60, max_size: int = 1000):
-        self.ttl = timedelta(seconds=ttl_seconds)
+    """
+    Thread-safe LRU cache whose entries expire after a fixed TTL.
+
+    - Reads refresh recency, so eviction at max_size drops the least recently used key.
+    - Expiry uses time.monotonic(), unaffected by wall-clock changes.
+    - Expired entries are swept proactively (at most once per TTL, on write),
+      not only when they happen to be read again.
+    - Hit / miss / eviction counters are exposed through stats().
+
+    With stale_seconds > 0 an entry stays readable through get_entry() for that
+    grace window after its TTL (stale-while-revalidate); get() only ever returns
+    fresh values. Past ttl + stale_seconds the entry is gone for good.
+    """
+
+    def __init__(self, ttl_seconds: int = 60, max_size: int = 1000, stale_seconds: int = 0):
+        self.ttl = ttl_seconds
+        self.stale_seconds = stale_seconds
         self.max_size = max_size
-        self._cache: Dict[str, tuple] = {}
+        # key -> (value, fresh_until, expire_time)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._next_sweep = time.monotonic() + self.ttl
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
 
     def get(self, key: str) -> Optional[Any]:
-        if key not in self._cache:
-            return None
+        entry = self.get_entry(key, allow_stale=False)
+        return entry[0] if entry else None
+
+    def get_entry(self, key: str, allow_stale: bool = True) -> Optional[Tuple[Any, bool]]:
+        """
+        Returns:
+            (value, is_fresh), or None if the key is missing or past its hard expiry.
+            Stale values are only returned when allow_stale is True.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            data, fresh_until, expire_time = entry
+
+            if now > expire_time:
+                del self._cache[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            is_fresh = now <= fresh_until
+            if not is_fresh and not allow_stale:
+                self.misses += 1
+                return None
+
+            self._cache.move_to_end(key)
+            if is_fresh:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+            return data, is_fresh
 
-        data, expire_time = self._cache[key]
+    def peek(self, key: str) -> Optional[Any]:
+        """Fresh value for key, without touching recency or hit / miss counters."""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or time.monotonic() > entry[1]:
+                return None
+            return entry[0]
 
-        if datetime.now() > expire_time:
-            del self._cache[key]
-            return None
-        
-        return data
+    def set(self, key: str, value: Any, age_seconds: float = 0):
+        """
+        Store value for key. age_seconds backdates the entry (e.g. a value loaded
+        from storage), so it is only fresh for what is left of its TTL.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
 
-    def set(self, key: str, value: Any):
-        if len(self._cache) >= self.max_size and key not in self._cache:
-            oldest_key = next(iter(self._cache))
-            del self._cache[oldest_key]
+            if key in self._cache:
+                self._cache.move_to_end(key)
+            elif len(self._cache) >= self.max_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
 
-        expire_time = datetime.now() + self.ttl
-        self._cache[key] = (value, expire_time)
+            fresh_until = now + self.ttl - max(age_seconds, 0)
+            self._cache[key] = (value, fresh_until, fresh_until + self.stale_seconds)
+
+    def _sweep(self, now: float):
+        """Drop every expired entry. Caller must hold the lock."""
+        expired = [k for k, (_, _, expire_time) in self._cache.items() if now > expire_time]
+        for k in expired:
+            del self._cache[k]
+        self.expirations += len(expired)
+        self._next_sweep = now + self.ttl
+
+    def delete(self, key: str):
+        with self._lock:
+            self._cache.pop(key, None)
 
     def clear(self):
-        self._cache.clear()
\ No newline at end of file
+        with self._lock:
+            self._cache.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cache)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self._cache),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "stale_seconds": self.stale_seconds,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one execution.
+    The first caller runs the function; callers arriving while it is in flight
+    block until it finishes and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a dependency is unhealthy.
+
+    CLOSED: calls go through; `failure_threshold` consecutive failures (errors,
+    or calls slower than `slow_call_seconds`) open the circuit. Exceptions in
+    `ignored_exceptions` (e.g. "unknown symbol") are re-raised but count as
+    a healthy answer.
+    OPEN: calls are rejected with CircuitOpenError for `recovery_seconds`.
+    HALF_OPEN: a single probe call is let through; success closes the circuit,
+    failure opens it again.
+    """
+
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_seconds: float = 30,
+        slow_call_seconds: Optional[float] = None,
+        ignored_exceptions: Tuple[type, ...] = (),
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.ignored_exceptions = ignored_exceptions
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        """Caller must hold the lock."""
+        if self._state == self.OPEN and now - self._opened_at >= self.recovery_seconds:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def _acquire(self) -> bool:
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def _on_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def _on_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def call(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        is_failure: Optional[Callable[[Any], bool]] = None,
+        slow_call_seconds: Optional[float] = None,
+    ) -> Any:
+        """
+        Run fn(*args) through the breaker.
+        Args:
+            is_failure: Optional check that marks a returned value as a failure
+                (e.g. an empty answer to a non-empty bulk request).
+            slow_call_seconds: Latency budget for this call, overriding the default.
+        Raises:
+            CircuitOpenError: If the circuit is open.
+        """
+        if not self._acquire():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+        started = time.monotonic()
+        try:
+            result = fn(*args)
+        except self.ignored_exceptions:
+            self._on_success()
+            raise
+        except Exception:
+            self._on_failure()
+            raise
+
+        budget = slow_call_seconds if slow_call_seconds is not None else self.slow_call_seconds
+        too_slow = budget is not None and time.monotonic() - started > budget
+        if too_slow or (is_failure is not None and is_failure(result)):
+            self._on_failure()
+        else:
+            self._on_success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self._current_state(time.monotonic()),
+                "consecutive_failures": self._failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+                "failure_threshold": self.failure_threshold,
+                "recovery_seconds": self.recovery_seconds,
+                "slow_call_seconds": self.slow_call_seconds,
+            }
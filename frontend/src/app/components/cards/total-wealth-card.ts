@@ -117,12 +117,8 @@ export class TotalWealthCard {
       await this.assetStore.loadAssets();
       this.marketStore.refreshPrices();
 
-      const foreignCurrencies = this.rateStore.foreignCurrencies();
       const base = this.settingsStore.baseCurrency();
-      
-      foreignCurrencies.forEach(curr => {
-        this.rateStore.loadRate({ fromCurr: curr, toCurr: base, force: true });
-      });
+      this.rateStore.loadRates({ base, force: true });
 
       setTimeout(() => {
         this.lastUpdated.set(new Date());
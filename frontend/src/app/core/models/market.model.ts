@@ -4,9 +4,20 @@ export interface StockPrice {
   currency: string;
 }
 
+export interface StockPriceBatch {
+  quotes: Record<string, StockPrice>; // keyed by requested ticker
+  not_found: string[];
+}
+
 export interface ExchangeRate {
   from: string;
   to: string;
   rate: number;
   updated_at: string; // ISO 8601
 }
+
+export interface ExchangeRateBatch {
+  base: string;
+  rates: Record<string, number>; // source currency -> rate to base
+  updated_at: string; // ISO 8601
+}
@@ -1,7 +1,7 @@
 import { Injectable, inject } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
 import { Observable } from 'rxjs';
-import { ExchangeRate } from '../models/market.model';
+import { ExchangeRate, ExchangeRateBatch } from '../models/market.model';
 
 @Injectable({
   providedIn: 'root',
@@ -15,4 +15,10 @@ export class RateService {
       params: { from_curr: fromCurr, to_curr: toCurr },
     });
   }
+
+  getExchangeRates(base: string): Observable<ExchangeRateBatch> {
+    return this.http.get<ExchangeRateBatch>(`${this.API_BASE}/rates`, {
+      params: { base },
+    });
+  }
 }
@@ -1,8 +1,8 @@
 import { Injectable, inject } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
-import { forkJoin, of, Observable } from 'rxjs';
+import { of, Observable } from 'rxjs';
 import { map, catchError } from 'rxjs/operators';
-import { StockPrice } from '../models/market.model';
+import { StockPrice, StockPriceBatch } from '../models/market.model';
 
 export type PriceMap = Record<string, StockPrice>;
 
@@ -20,30 +20,25 @@ export class MarketService {
   fetchBatchPrices(targets: { ticker: string; region: string }[]): Observable<PriceMap> {
     if (targets.length === 0) return of({});
 
-    const requests = targets.map((target) =>
-      this.http
-        .get<StockPrice>(`${this.API_BASE}/stock/${target.ticker}`, {
-          params: { region: target.region },
-        })
-        .pipe(
-          catchError((err) => {
-            console.warn(`[MarketService] 查價失敗: ${target.ticker}`, err);
-            return of(null);
-          }),
-        ),
-    );
-
-    return forkJoin(requests).pipe(
-      map((results) => {
-        const priceMap: PriceMap = {};
-        results.forEach((res, index) => {
-          if (res) {
-            const originalTicker = targets[index].ticker;
-            priceMap[originalTicker] = res;
+    // One request for all symbols; the backend resolves them in a single bulk download
+    return this.http
+      .get<StockPriceBatch>(`${this.API_BASE}/stocks`, {
+        params: {
+          tickers: targets.map((t) => t.ticker).join(','),
+          regions: targets.map((t) => t.region).join(','),
+        },
+      })
+      .pipe(
+        map((res) => {
+          if (res.not_found.length > 0) {
+            console.warn(`[MarketService] 查價失敗: ${res.not_found.join(', ')}`);
           }
-        });
-        return priceMap;
-      }),
-    );
+          return res.quotes as PriceMap;
+        }),
+        catchError((err) => {
+          console.warn('[MarketService] 批次查價失敗', err);
+          return of({});
+        }),
+      );
   }
 }
@@ -3,10 +3,10 @@ import { patchState, signalStore, withComputed, withMethods, withState } from '@
 import { rxMethod } from '@ngrx/signals/rxjs-interop';
 import { tapResponse } from '@ngrx/operators';
 import { pipe } from 'rxjs';
-import { tap, mergeMap } from 'rxjs/operators';
+import { tap, mergeMap, switchMap } from 'rxjs/operators';
 
 import { RateService } from '../services/exchange_rate.service';
-import { ExchangeRate } from '../models/market.model';
+import { ExchangeRate, ExchangeRateBatch } from '../models/market.model';
 import { SUPPORTED_CURRENCIES } from '../config/currency.config';
 
 type RateState = {
@@ -61,5 +61,34 @@ export const RateStore = signalStore(
         ),
       ),
     ),
+
+    // Action: loadRates fetches every currency -> base rate in one call
+    loadRates: rxMethod<{ base: string; force?: boolean }>(
+      pipe(
+        tap(() => patchState(store, { isLoading: true })),
+        switchMap(({ base }) =>
+          rateService.getExchangeRates(base).pipe(
+            tapResponse({
+              next: (data: ExchangeRateBatch) => {
+                const updatedAt = new Date(data.updated_at).getTime();
+                const rates: Record<string, number> = {};
+                const timestamps: Record<string, number> = {};
+                Object.entries(data.rates).forEach(([fromCurr, rate]) => {
+                  const key = `${fromCurr}-${data.base}`;
+                  rates[key] = rate;
+                  timestamps[key] = updatedAt;
+                });
+                patchState(store, (state) => ({
+                  isLoading: false,
+                  rates: { ...state.rates, ...rates },
+                  timestamps: { ...state.timestamps, ...timestamps },
+                }));
+              },
+              error: (error) => patchState(store, { isLoading: false, error }),
+            }),
+          ),
+        ),
+      ),
+    ),
   })),
 );
\ No newline at end of file
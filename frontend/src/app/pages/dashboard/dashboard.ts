@@ -91,15 +91,15 @@ export class DashboardComponent implements OnInit {
         const timestamps = this.rateStore.rateTimestamps();
         const now = Date.now();
 
-        foreignCurrencies.forEach((currency) => {
-          const rateKey = `${currency}-${baseCurr}`;
-          const lastUpdate = timestamps[rateKey];
-          const isStale = !lastUpdate || now - lastUpdate > this.RATE_CACHE_DURATION;
-
-          if (isStale) {
-            this.rateStore.loadRate({ fromCurr: currency, toCurr: baseCurr });
-          }
+        const hasStaleRate = [...foreignCurrencies].some((currency) => {
+          const lastUpdate = timestamps[`${currency}-${baseCurr}`];
+          return !lastUpdate || now - lastUpdate > this.RATE_CACHE_DURATION;
         });
+
+        // One batch call refreshes every pair to the base currency
+        if (hasStaleRate) {
+          this.rateStore.loadRates({ base: baseCurr });
+        }
       });
     });
 